@@ -0,0 +1,76 @@
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy import create_engine, pool, text
+from sqlalchemy.engine import make_url
+from app.core.config import settings
+from app.db.database import Base
+from app.db import models  # noqa: F401 (registers the tables on Base.metadata)
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# Any constant works; it only has to be the same for every migration runner
+MIGRATION_LOCK_ID = 7_246_001
+
+
+def _sync_database_url():
+    """Migrations run on the sync psycopg2 driver, whatever driver DATABASE_URL names."""
+    db_url = make_url(settings.DATABASE_URL).set(drivername="postgresql+psycopg2")
+    if "ssl" in db_url.query:
+        query = dict(db_url.query)
+        query["sslmode"] = query.pop("ssl")
+        db_url = db_url.set(query=query)
+    return db_url
+
+
+def run_migrations_offline() -> None:
+    """`alembic upgrade head --sql`: emit the SQL for a DBA instead of running it."""
+    context.configure(
+        url=_sync_database_url(),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        transaction_per_migration=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    # ✅ No statement_timeout: the app's 30s limit would cancel index builds and backfills
+    connectable = create_engine(
+        _sync_database_url(),
+        poolclass=pool.NullPool,
+        connect_args={"options": "-c statement_timeout=0"},
+    )
+
+    with connectable.connect() as connection:
+        # ✅ Two runners started together (e.g. a re-triggered Job) take turns instead of racing
+        connection.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        # DDL waiting behind a long transaction would queue every query behind it; give up instead
+        connection.execute(text(f"SET lock_timeout = {int(settings.MIGRATION_LOCK_TIMEOUT_MS)}"))
+        connection.commit()
+
+        try:
+            context.configure(
+                connection=connection,
+                target_metadata=target_metadata,
+                transaction_per_migration=True,
+            )
+            with context.begin_transaction():
+                context.run_migrations()
+        finally:
+            connection.rollback()
+            connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+            connection.commit()
+
+    connectable.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,47 @@
+"""conversations.summarized_until(_id) high-water mark for incremental summaries
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('conversations', sa.Column('summarized_until', sa.TIMESTAMP(), nullable=True), if_not_exists=True)
+    op.add_column(
+        'conversations', sa.Column('summarized_until_id', postgresql.UUID(as_uuid=True), nullable=True), if_not_exists=True
+    )
+    # Existing summaries already cover their whole history; without a mark the summarizer
+    # would fold every message in again, from the first one. One pass over messages, and it
+    # only touches the conversations that have a summary.
+    op.execute("""
+        UPDATE conversations
+        SET summarized_until = latest.created_at, summarized_until_id = latest.id
+        FROM (
+            SELECT DISTINCT ON (conversation_id) conversation_id, created_at, id
+            FROM messages
+            ORDER BY conversation_id, created_at DESC, id DESC
+        ) AS latest
+        WHERE latest.conversation_id = conversations.id
+          AND conversations.summary IS NOT NULL
+          AND conversations.summarized_until IS NULL
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('conversations', 'summarized_until_id')
+    op.drop_column('conversations', 'summarized_until')
@@ -0,0 +1,46 @@
+"""refresh_sessions: rotating per-device refresh token families
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'refresh_sessions',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('family_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('token_hash', sa.String(length=64), nullable=False),
+        sa.Column('device', sa.String(), nullable=True),
+        sa.Column('created_at', sa.TIMESTAMP(), nullable=True),
+        sa.Column('expires_at', sa.TIMESTAMP(), nullable=False),
+        sa.Column('rotated_at', sa.TIMESTAMP(), nullable=True),
+        sa.Column('revoked_at', sa.TIMESTAMP(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True,
+    )
+    # New, empty table: plain index builds are instant here
+    op.create_index('ix_refresh_sessions_user_id', 'refresh_sessions', ['user_id'], if_not_exists=True)
+    op.create_index('ix_refresh_sessions_family_id', 'refresh_sessions', ['family_id'], if_not_exists=True)
+    op.create_index('ix_refresh_sessions_expires_at', 'refresh_sessions', ['expires_at'], if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('refresh_sessions')
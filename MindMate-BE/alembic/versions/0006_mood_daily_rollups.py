@@ -0,0 +1,55 @@
+"""mood_daily_rollups, and mood_logs.in_rollup to track which logs they count
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from app.db.migration_ops import create_index_concurrently, drop_index_concurrently
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'mood_daily_rollups',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.Column('count_1', sa.Integer(), nullable=False),
+        sa.Column('count_2', sa.Integer(), nullable=False),
+        sa.Column('count_3', sa.Integer(), nullable=False),
+        sa.Column('count_4', sa.Integer(), nullable=False),
+        sa.Column('count_5', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'day'),
+        if_not_exists=True,
+    )
+
+    # Added without a default, so existing logs read NULL ("counted by the 0007 backfill")
+    # and nothing is rewritten. The default then applies to new rows only: logs inserted by
+    # pods still on the previous release come in as false and the reconciler picks them up.
+    op.add_column('mood_logs', sa.Column('in_rollup', sa.Boolean(), nullable=True), if_not_exists=True)
+    op.alter_column('mood_logs', 'in_rollup', server_default=sa.false())
+
+    create_index_concurrently(
+        'ix_mood_logs_pending_rollup', 'mood_logs', ['id'], postgresql_where=sa.text('in_rollup = false')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_index_concurrently('ix_mood_logs_pending_rollup', 'mood_logs')
+    op.drop_column('mood_logs', 'in_rollup')
+    op.drop_table('mood_daily_rollups')
@@ -0,0 +1,41 @@
+"""Build mood_daily_rollups from the mood logs written before it existed
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from app.core.config import settings
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Runs before the new release takes traffic, so nothing reads the rollups yet. Rebuilt from
+    # scratch in case an earlier, unmigrated startup already filled the table. Only the
+    # in_rollup IS NULL rows (present when 0006 ran) are counted here; anything inserted since
+    # is false and left to the app's reconciler, so no log is counted twice.
+    day = f"date(timezone('{settings.USER_TIMEZONE}', timezone('UTC', created_at)))"
+    op.execute("DELETE FROM mood_daily_rollups")
+    op.execute(f"""
+        INSERT INTO mood_daily_rollups (user_id, day, count, total, count_1, count_2, count_3, count_4, count_5)
+        SELECT user_id, {day}, count(*), sum(mood),
+               count(*) FILTER (WHERE mood = 1), count(*) FILTER (WHERE mood = 2), count(*) FILTER (WHERE mood = 3),
+               count(*) FILTER (WHERE mood = 4), count(*) FILTER (WHERE mood = 5)
+        FROM mood_logs
+        WHERE in_rollup IS NULL AND created_at IS NOT NULL
+        GROUP BY user_id, {day}
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM mood_daily_rollups")
@@ -0,0 +1,28 @@
+"""(user_id, created_at) indexes for the paginated mood and journal listings
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from app.db.migration_ops import create_index_concurrently, drop_index_concurrently
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, Sequence[str], None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    create_index_concurrently('ix_mood_logs_user_created', 'mood_logs', ['user_id', 'created_at'])
+    create_index_concurrently('ix_journal_entries_user_created', 'journal_entries', ['user_id', 'created_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_index_concurrently('ix_journal_entries_user_created', 'journal_entries')
+    drop_index_concurrently('ix_mood_logs_user_created', 'mood_logs')
@@ -0,0 +1,89 @@
+"""journal_entries.search_vector, kept up to date by a trigger, plus the search GIN indexes
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from app.db.migration_ops import create_index_concurrently, drop_index_concurrently
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, Sequence[str], None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Title matches rank above description matches
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce({row}title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce({row}description, '')), 'B')"
+)
+BACKFILL_BATCH = 1000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # A GENERATED ... STORED column would rewrite the whole table under an exclusive lock.
+    # Nullable with no default is a catalog-only change; a trigger fills it from here on.
+    op.add_column('journal_entries', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True), if_not_exists=True)
+    # Databases where the old startup code already added it as a generated column: keep the
+    # values, drop the expression (catalog-only, PG13+) and let the trigger take over
+    op.execute("""
+        DO $$
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'journal_entries' AND column_name = 'search_vector' AND is_generated = 'ALWAYS'
+            ) THEN
+                ALTER TABLE journal_entries ALTER COLUMN search_vector DROP EXPRESSION;
+            END IF;
+        END $$
+    """)
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION journal_entries_search_vector() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {SEARCH_VECTOR.format(row='NEW.')};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DROP TRIGGER IF EXISTS journal_entries_search_vector ON journal_entries")
+    op.execute("""
+        CREATE TRIGGER journal_entries_search_vector
+        BEFORE INSERT OR UPDATE OF title, description ON journal_entries
+        FOR EACH ROW EXECUTE FUNCTION journal_entries_search_vector()
+    """)
+
+    # ✅ Existing rows in short batches, each committed on its own, so no long row locks
+    with op.get_context().autocommit_block():
+        op.execute(f"""
+            DO $$
+            DECLARE
+                updated integer;
+            BEGIN
+                LOOP
+                    UPDATE journal_entries SET search_vector = {SEARCH_VECTOR.format(row='')}
+                    WHERE id IN (SELECT id FROM journal_entries WHERE search_vector IS NULL LIMIT {BACKFILL_BATCH});
+                    GET DIAGNOSTICS updated = ROW_COUNT;
+                    EXIT WHEN updated = 0;
+                    COMMIT;
+                END LOOP;
+            END $$
+        """)
+
+    create_index_concurrently('ix_journal_entries_search', 'journal_entries', ['search_vector'], postgresql_using='gin')
+    create_index_concurrently('ix_journal_entries_tags', 'journal_entries', ['tags'], postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_index_concurrently('ix_journal_entries_tags', 'journal_entries')
+    drop_index_concurrently('ix_journal_entries_search', 'journal_entries')
+    op.execute("DROP TRIGGER IF EXISTS journal_entries_search_vector ON journal_entries")
+    op.execute("DROP FUNCTION IF EXISTS journal_entries_search_vector()")
+    op.drop_column('journal_entries', 'search_vector')
@@ -0,0 +1,67 @@
+"""journal_entries.similarity_vector for /journal/{id}/related
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from app.services.journal_similarity import STORE_VECTORS, vector_for
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, Sequence[str], None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BACKFILL_BATCH = 500
+
+journal_entries = sa.table(
+    'journal_entries',
+    sa.column('id', postgresql.UUID(as_uuid=True)),
+    sa.column('title', sa.String()),
+    sa.column('description', sa.Text()),
+    sa.column('tags', postgresql.ARRAY(sa.String())),
+    sa.column('similarity_vector', sa.LargeBinary()),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Nullable, no default: a catalog-only change
+    op.add_column('journal_entries', sa.Column('similarity_vector', sa.LargeBinary(), nullable=True), if_not_exists=True)
+
+    # The vectors are computed in Python, so there's no SQL to print here; with --sql,
+    # entries get their vector on the first /related request instead
+    context = op.get_context()
+    if context.as_sql:
+        return
+
+    # ✅ Existing entries, walked by id in batches; each batch is one UPDATE, committed on its own
+    bind = op.get_bind()
+    with context.autocommit_block():
+        last_id = None
+        while True:
+            query = (
+                sa.select(journal_entries.c.id, journal_entries.c.title, journal_entries.c.description, journal_entries.c.tags)
+                .where(journal_entries.c.similarity_vector.is_(None))
+                .order_by(journal_entries.c.id)
+                .limit(BACKFILL_BATCH)
+            )
+            if last_id is not None:
+                query = query.where(journal_entries.c.id > last_id)
+            entries = bind.execute(query).all()
+            if not entries:
+                break
+            bind.execute(STORE_VECTORS, {"ids": [e.id for e in entries], "vectors": [vector_for(e) for e in entries]})
+            last_id = entries[-1].id
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('journal_entries', 'similarity_vector')
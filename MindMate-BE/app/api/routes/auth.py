@@ -1,34 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.db.database import SessionLocal
+from fastapi import APIRouter, Depends, HTTPException, Request
+from uuid import UUID
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_db
 from app.schemas.user import UserCreate, UserLogin, Token,RefreshRequest,PASSWORD_REGEX
-from app.schemas.auth import ResetPasswordRequest, ForgotPasswordRequest
-from app.services.auth_service import register_user, authenticate_user,generate_tokens,save_refresh_token,create_email_verification_token,hash_password
-from app.core.security import create_access_token,create_refresh_token,create_password_reset_token,verify_password_reset_token,create_password_reset_token_for_db
+from app.schemas.auth import ResetPasswordRequest, ForgotPasswordRequest, SessionOut
+from app.services.auth_service import register_user, authenticate_user
+from app.core.security import create_password_reset_token_for_db,hash_password_async
 from fastapi import Body
-from jose import jwt, JWTError  
+from jose import jwt  
 from app.core.config import settings  
 from app.db import models
 from datetime import datetime
-from app.services.mail_service import send_verification_email,send_reset_password_email
+from app.services.mail_service import send_reset_password_email
+from app.dependencies.auth import invalidate_cached_user, get_current_user
+from app.services.google_oauth import exchange_code, get_google_profile
+from app.services.token_store import issue_token_pair, rotate_refresh_token, revoke_refresh_token, list_active_sessions, revoke_session_family
 import re
-import requests
 from urllib.parse import urlencode
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-
 GOOGLE_AUTH_BASE_URL = "https://accounts.google.com/o/oauth2/v2/auth"
-GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
-GOOGLE_USERINFO_URL = "https://www.googleapis.com/oauth2/v1/userinfo"
 
 @router.get("/google-login")
 def google_login():
@@ -45,26 +38,17 @@ def google_login():
 
 
 @router.get("/google/callback")
-def google_callback(code: str, db: Session = Depends(get_db)):
+async def google_callback(code: str, request: Request, db: AsyncSession = Depends(get_db)):
     # Step 1: Exchange code for token
-    token_data = {
-        "code": code,
-        "client_id": settings.GOOGLE_CLIENT_ID,
-        "client_secret": settings.GOOGLE_CLIENT_SECRET,
-        "redirect_uri": settings.GOOGLE_REDIRECT_URI,
-        "grant_type": "authorization_code"
-    }
-
-    token_response = requests.post(GOOGLE_TOKEN_URL, data=token_data)
-    token_json = token_response.json()
+    token_json = await exchange_code(code)
     access_token = token_json.get("access_token")
+    id_token = token_json.get("id_token")
 
     if not access_token:
         raise HTTPException(status_code=400, detail="Failed to get access token from Google")
 
-    # Step 2: Get user info from Google
-    userinfo_response = requests.get(GOOGLE_USERINFO_URL, params={"access_token": access_token})
-    userinfo = userinfo_response.json()
+    # Step 2: Get user info (from the verified ID token when Google sent one)
+    userinfo = await get_google_profile(access_token, id_token)
 
     email = userinfo.get("email")
     first_name = userinfo.get("given_name")
@@ -73,7 +57,7 @@ def google_callback(code: str, db: Session = Depends(get_db)):
     if not email:
         raise HTTPException(status_code=400, detail="Google account has no email")
 
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = await db.scalar(select(models.User).where(models.User.email == email))
 
     if user:
         if not user.is_google_linked:
@@ -82,7 +66,8 @@ def google_callback(code: str, db: Session = Depends(get_db)):
                 "detail": "Account exists. Do you want to link your Google account?",
                 "requires_linking": True,
                 "email": email,
-                "access_token": access_token  # send this back for `/link-google`
+                "access_token": access_token,  # send this back for `/link-google`
+                "id_token": id_token
             }
         # Already linked — login
     else:
@@ -98,12 +83,11 @@ def google_callback(code: str, db: Session = Depends(get_db)):
             last_name=last_name
         )
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
 
-    # Generate JWTs
-    access_token_jwt, refresh_token = generate_tokens(user)
-    save_refresh_token(db, user, refresh_token)
+    # Generate JWTs (new device session)
+    access_token_jwt, refresh_token = await issue_token_pair(db, user, device=request.headers.get("user-agent"))
 
     return {
         "access_token": access_token_jwt,
@@ -117,26 +101,20 @@ def google_callback(code: str, db: Session = Depends(get_db)):
 
 
 @router.post("/register")
-async def register(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = register_user(db, user)
-
-    # ✅ create verification token
-    token = create_email_verification_token(db_user.email)
-
-    # ✅ send email
-    await send_verification_email(db_user.email, token)
+async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    # ✅ Creates the user and queues the verification email (sent by the outbox worker)
+    await register_user(db, user)
 
     return {"message": "User created! Please check your email for verification link."}
 
 
 @router.post("/login", response_model=Token)
-def login(user: UserLogin, db: Session = Depends(get_db)):
-    db_user = authenticate_user(db, user.email, user.password)
+async def login(user: UserLogin, request: Request, db: AsyncSession = Depends(get_db)):
+    db_user = await authenticate_user(db, user.email, user.password)
     if not db_user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    access_token, refresh_token = generate_tokens(db_user)
-    save_refresh_token(db, db_user, refresh_token)
+    access_token, refresh_token = await issue_token_pair(db, db_user, device=request.headers.get("user-agent"))
     
     return {
         "access_token": access_token,
@@ -145,22 +123,11 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
     }
 
 @router.post("/refresh", response_model=Token)
-def refresh_token(payload: RefreshRequest, db: Session = Depends(get_db)):
-    refresh_token = payload.refresh_token  # ✅ Extract from JSON
-    
-    try:
-        decoded_payload = jwt.decode(refresh_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email = decoded_payload.get("sub")
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid refresh token")
-
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if not user or user.refresh_token != refresh_token:
-        raise HTTPException(status_code=401, detail="Invalid refresh token or user")
-
-    new_access_token = create_access_token({"sub": user.email})
-    new_refresh_token = create_refresh_token({"sub": user.email})
-    save_refresh_token(db, user, new_refresh_token)
+async def refresh_token(payload: RefreshRequest, request: Request, db: AsyncSession = Depends(get_db)):
+    # ✅ Rotates within the token's device family; a replayed token revokes the family
+    new_access_token, new_refresh_token = await rotate_refresh_token(
+        db, payload.refresh_token, device=request.headers.get("user-agent")
+    )
 
     return {
         "access_token": new_access_token,
@@ -170,61 +137,63 @@ def refresh_token(payload: RefreshRequest, db: Session = Depends(get_db)):
 
 
 @router.post("/logout")
-def logout_user(
+async def logout_user(
     req: RefreshRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     refresh_token = req.refresh_token
     if not refresh_token:
         raise HTTPException(status_code=400, detail="Refresh token is required")
 
-    # ✅ Decode token to find which user is logging out
-    try:
-        decoded_payload = jwt.decode(
-            refresh_token,
-            settings.SECRET_KEY,
-            algorithms=[settings.ALGORITHM]
-        )
-        email = decoded_payload.get("sub")
+    # ✅ Revoke only this device's session; other devices stay logged in
+    user = await revoke_refresh_token(db, refresh_token)
+    await invalidate_cached_user(user.email)
 
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    return {"detail": "Logged out successfully"}
 
-    # ✅ Find the user
-    user = db.query(models.User).filter(models.User.email == email).first()
 
-    if not user or user.refresh_token != refresh_token:
-        raise HTTPException(status_code=401, detail="Invalid refresh token or user")
+@router.get("/sessions", response_model=list[SessionOut])
+async def list_sessions(
+    db: AsyncSession = Depends(get_db),
+    user: models.User = Depends(get_current_user)
+):
+    return await list_active_sessions(db, user.id)
 
-    # ✅ Invalidate refresh token
-    user.refresh_token = None
-    db.commit()
 
-    return {"detail": "Logged out successfully"}
+@router.delete("/sessions/{family_id}")
+async def revoke_session(
+    family_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    user: models.User = Depends(get_current_user)
+):
+    if not await revoke_session_family(db, user.id, family_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"detail": "Session revoked"}
 
 
 @router.get("/verify-email")
-def verify_email(token: str, db: Session = Depends(get_db)):
+async def verify_email(token: str, db: AsyncSession = Depends(get_db)):
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         email = payload.get("sub")
     except:
         raise HTTPException(status_code=400, detail="Invalid or expired token")
 
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = await db.scalar(select(models.User).where(models.User.email == email))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
     user.is_verified = True
-    db.commit()
+    await db.commit()
+    await invalidate_cached_user(user.email)
 
     return {"message": "Email verified successfully! You can now log in."}
 
 @router.post("/forgot-password")
-async def forgot_password(payload: ForgotPasswordRequest, db: Session = Depends(get_db)):
+async def forgot_password(payload: ForgotPasswordRequest, db: AsyncSession = Depends(get_db)):
     email = payload.email.lower()
 
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = await db.scalar(select(models.User).where(models.User.email == email))
     
     # ✅ Security best practice: don't reveal if user exists
     if not user:
@@ -235,8 +204,8 @@ async def forgot_password(payload: ForgotPasswordRequest, db: Session = Depends(
         return {"message": "Please verify your email before requesting a password reset."}
 
     # ✅ Generate and send reset link
-    token = create_password_reset_token_for_db(db, user)
-    await send_reset_password_email(user.email, token)
+    token = await create_password_reset_token_for_db(db, user)
+    send_reset_password_email(user.email, token)
 
     return {"message": "If an account exists and is verified, a password reset link was sent."}
 
@@ -244,12 +213,11 @@ async def forgot_password(payload: ForgotPasswordRequest, db: Session = Depends(
 
 
 @router.post("/reset-password")
-def reset_password(req: ResetPasswordRequest, db: Session = Depends(get_db)):
+async def reset_password(req: ResetPasswordRequest, db: AsyncSession = Depends(get_db)):
     # ✅ Look up token in DB
-    reset_token_entry = (
-        db.query(models.PasswordResetToken)
-        .filter(models.PasswordResetToken.token == req.token)
-        .first()
+    reset_token_entry = await db.scalar(
+        select(models.PasswordResetToken)
+        .where(models.PasswordResetToken.token == req.token)
     )
 
     if not reset_token_entry:
@@ -264,7 +232,7 @@ def reset_password(req: ResetPasswordRequest, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Token already used")
 
     # ✅ Get the user
-    user = db.query(models.User).filter(models.User.id == reset_token_entry.user_id).first()
+    user = await db.get(models.User, reset_token_entry.user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -273,32 +241,31 @@ def reset_password(req: ResetPasswordRequest, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Weak password. Must include upper, lower, number, special char, min 8 chars.")
 
     # ✅ Hash & update
-    user.hashed_password = hash_password(req.new_password)
-    db.commit()
+    user.hashed_password = await hash_password_async(req.new_password)
+    await db.commit()
 
     # ✅ Mark token as used
     reset_token_entry.used = True
-    db.commit()
+    await db.commit()
+    await invalidate_cached_user(user.email)
 
     return {"message": "Password has been reset successfully!"}
 
 @router.post("/link-google")
-def link_google_account(
+async def link_google_account(
+    request: Request,
     email: str = Body(...),
     access_token: str = Body(...),
-    db: Session = Depends(get_db)
+    id_token: str | None = Body(None),
+    db: AsyncSession = Depends(get_db)
 ):
-    # Get user info from access token
-    userinfo_response = requests.get(
-        GOOGLE_USERINFO_URL,
-        params={"access_token": access_token}
-    )
-    userinfo = userinfo_response.json()
+    # Get user info from the ID token, falling back to the access token
+    userinfo = await get_google_profile(access_token, id_token)
     
     if userinfo.get("email") != email:
         raise HTTPException(status_code=400, detail="Email mismatch")
 
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = await db.scalar(select(models.User).where(models.User.email == email))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -310,11 +277,11 @@ def link_google_account(
     user.first_name = userinfo.get("given_name") or user.first_name
     user.last_name = userinfo.get("family_name") or user.last_name
     user.is_verified = True
-    db.commit()
+    await db.commit()
+    await invalidate_cached_user(user.email)
 
     # Issue new tokens
-    access_token_jwt, refresh_token = generate_tokens(user)
-    save_refresh_token(db, user, refresh_token)
+    access_token_jwt, refresh_token = await issue_token_pair(db, user, device=request.headers.get("user-agent"))
 
     return {
         "message": "Google account linked successfully",
@@ -325,17 +292,17 @@ def link_google_account(
 
 
 @router.post("/set-password")
-def set_password(
+async def set_password(
     email: str = Body(...),
     new_password: str = Body(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     from app.schemas.user import PASSWORD_REGEX  # reuse existing regex
 
     if not re.match(PASSWORD_REGEX, new_password):
         raise HTTPException(status_code=400, detail="Weak password")
 
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = await db.scalar(select(models.User).where(models.User.email == email))
 
     if not user or not user.is_verified:
         raise HTTPException(status_code=400, detail="Invalid or unverified user")
@@ -343,7 +310,8 @@ def set_password(
     if user.hashed_password:
         raise HTTPException(status_code=400, detail="Password already set")
 
-    user.hashed_password = hash_password(new_password)
-    db.commit()
+    user.hashed_password = await hash_password_async(new_password)
+    await db.commit()
+    await invalidate_cached_user(user.email)
 
     return {"message": "Password set successfully. You can now log in with email/password."}
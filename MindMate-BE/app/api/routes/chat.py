@@ -1,249 +1,277 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+import asyncio
+import json
+import logging
+from fastapi import APIRouter, Depends, Header, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
-from datetime import datetime
-import pdfkit
-from fastapi.responses import FileResponse
+from typing import Optional
+from fastapi.responses import FileResponse, StreamingResponse
 from pytz import timezone  # ✅ Added for IST conversion
-from app.db.database import get_db
+from app.db.database import get_db, SessionLocal
 from app.db import models 
 from app.schemas import chat as schemas
-from app.services.encryption import encrypt_message, decrypt_message
-from app.services.gpt_client import get_mental_health_reply, summarize_conversation
+from app.services.encryption import decrypt_stored_message
+from app.services.gpt_client import get_mental_health_reply, stream_mental_health_reply, OFF_TOPIC_REPLY
+from app.services.chat_service import get_owned_conversation, save_message, load_context
+from app.services.summarizer import summary_scheduler
+from app.services.topic_classifier import classify_message
+from app.services.conversation_lock import conversation_locks
+from app.services.idempotency import run_once, request_fingerprint, IDEMPOTENCY_KEY_HEADER, REPLAYED_HEADER
+from app.services.pdf_export import get_conversation_pdf
+from app.services.pagination import keyset_page, set_cursor_headers, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from app.dependencies.auth import get_current_user
 from app.db.models import User 
-from fastapi import HTTPException, status
 
 # ✅ Define IST timezone
 IST = timezone("Asia/Kolkata")
 
 router = APIRouter(prefix="/chat", tags=["chat"])
+logger = logging.getLogger(__name__)
 
 # ========================
 # ✅ Chat Message Endpoint
 # ========================
 
+async def _save_canned_exchange(db: AsyncSession, conversation_id, message: str):
+    """Stores the user message and the canned refusal; the summary isn't refreshed for these."""
+    await save_message(db, conversation_id, "user", message)
+    return await save_message(db, conversation_id, "assistant", OFF_TOPIC_REPLY)
+
 
 @router.post("/send", response_model=schemas.ChatResponse)
 async def send_message(
     req: schemas.ChatRequest,
-    db: Session = Depends(get_db),
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_KEY_HEADER, max_length=255),
+    db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user)
 ):
-    # 🔐 Check if conversation exists
-    convo = db.query(models.Conversation).get(req.conversation_id)
-    if not convo:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Conversation not found"
+    convo = await get_owned_conversation(db, req.conversation_id, user)
+
+    if not idempotency_key:
+        return await _send(db, convo, req)
+
+    # ✅ Client retries with the same key get the stored reply instead of a second LLM call
+    result, replayed = await run_once(
+        f"chat-send:{user.id}",
+        idempotency_key,
+        request_fingerprint(req.conversation_id, req.message),
+        lambda: _send(db, convo, req)
+    )
+    if replayed:
+        response.headers[REPLAYED_HEADER] = "true"
+    return result
+
+
+async def _send(db: AsyncSession, convo, req: schemas.ChatRequest) -> dict:
+    route = classify_message(req.message, req.conversation_id)
+
+    # ✅ One send at a time per conversation, so a second send sees the first exchange
+    async with conversation_locks.hold(convo.id):
+        # ✅ Clearly off-topic messages get the canned refusal without a gpt-4o call
+        if route == "refuse":
+            await _save_canned_exchange(db, req.conversation_id, req.message)
+            return {"reply": OFF_TOPIC_REPLY}
+
+        # ✅ Fetch recent messages for context (before the new one, which is sent separately)
+        context_messages = await load_context(db, req.conversation_id)
+
+        # ✅ Save user message
+        await save_message(db, req.conversation_id, "user", req.message)
+
+        # ✅ Get bot reply with memory
+        bot_reply = await get_mental_health_reply(
+            context_messages, 
+            req.message, 
+            summary=convo.summary
         )
 
-    # 🔐 Check if conversation belongs to current user
-    if convo.user_id != user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You are not authorized to access this conversation"
+        # ✅ Save bot reply
+        await save_message(db, req.conversation_id, "assistant", bot_reply)
+
+    # ✅ Refresh the conversation summary off the request path
+    summary_scheduler.schedule(convo.id)
+
+    return {"reply": bot_reply}
+
+
+# ==================================
+# ✅ Streaming Chat Endpoint (SSE)
+# ==================================
+
+# ✅ Keep references so running producers aren't garbage collected
+_reply_tasks = set()
+
+
+def _sse(data: dict, event: str | None = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+async def _produce_reply(queue: asyncio.Queue, conversation_id, context_messages, message, summary, release):
+    """
+    Pulls the reply from gpt-4o into `queue` and persists it once complete.
+    Runs detached from the HTTP response so a client disconnect never leaves
+    a user message without its reply. Releases the conversation lock when done.
+    """
+    try:
+        chunks = []
+        try:
+            async for token in stream_mental_health_reply(context_messages, message, summary=summary):
+                chunks.append(token)
+                queue.put_nowait(("token", token))
+        except Exception:
+            logger.exception("Streaming reply failed for conversation %s", conversation_id)
+            queue.put_nowait(("error", "Failed to generate a reply"))
+            return
+
+        bot_reply = "".join(chunks)
+
+        # ✅ The request's session is already closed by now, so open our own
+        try:
+            async with SessionLocal() as db:
+                bot_msg = await save_message(db, conversation_id, "assistant", bot_reply)
+            queue.put_nowait(("done", str(bot_msg.id)))
+            summary_scheduler.schedule(conversation_id)
+        except Exception:
+            logger.exception("Failed to persist streamed reply for conversation %s", conversation_id)
+            queue.put_nowait(("error", "Failed to save the reply"))
+    finally:
+        await release()
+
+
+@router.post("/send/stream")
+async def send_message_stream(
+    req: schemas.ChatRequest,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user)
+):
+    convo = await get_owned_conversation(db, req.conversation_id, user)
+    route = classify_message(req.message, req.conversation_id)
+
+    # ✅ Held until the reply is saved, which happens after this handler returns
+    release = await conversation_locks.acquire(convo.id)
+
+    if route == "refuse":
+        try:
+            bot_msg = await _save_canned_exchange(db, req.conversation_id, req.message)
+        finally:
+            await release()
+
+        async def canned_stream():
+            yield _sse({"token": OFF_TOPIC_REPLY})
+            yield _sse({"message_id": str(bot_msg.id)}, event="done")
+
+        return StreamingResponse(
+            canned_stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
         )
 
-    # ✅ Save user message
-    user_msg = models.Message(
-        conversation_id=req.conversation_id,
-        sender="user",
-        encrypted_text=encrypt_message(req.message)
-    )
-    db.add(user_msg)
-    db.commit()
-
-    # ✅ Fetch last messages for context
-    past_msgs = (
-        db.query(models.Message)
-        .filter_by(conversation_id=req.conversation_id)
-        .order_by(models.Message.created_at)
-        .all()
-    )
-    context_messages = [
-        {"sender": m.sender, "text": decrypt_message(m.encrypted_text)}
-        for m in past_msgs
-    ]
+    # ✅ Build context and save user message before the stream starts
+    try:
+        context_messages = await load_context(db, req.conversation_id)
+        await save_message(db, req.conversation_id, "user", req.message)
+    except BaseException:
+        await release()
+        raise
 
-    # ✅ Get bot reply with memory
-    bot_reply = await get_mental_health_reply(
-        context_messages, 
-        req.message, 
-        summary=convo.summary
+    queue: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(
+        _produce_reply(queue, req.conversation_id, context_messages, req.message, convo.summary, release)
     )
+    _reply_tasks.add(task)
+    task.add_done_callback(_reply_tasks.discard)
 
-    # ✅ Save bot reply
-    bot_msg = models.Message(
-        conversation_id=req.conversation_id,
-        sender="assistant",
-        encrypted_text=encrypt_message(bot_reply)
-    )
-    db.add(bot_msg)
-    db.commit()
+    async def event_stream():
+        # ✅ If the client goes away this generator is cancelled; the producer keeps going
+        while True:
+            kind, data = await queue.get()
+            if kind == "token":
+                yield _sse({"token": data})
+            elif kind == "done":
+                yield _sse({"message_id": data}, event="done")
+                return
+            else:
+                yield _sse({"detail": data}, event="error")
+                return
 
-    # ✅ Update conversation summary
-    new_summary = await summarize_conversation(
-        context_messages + [{"sender": "assistant", "text": bot_reply}]
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
-    convo.summary = new_summary
-    convo.updated_at = datetime.utcnow()
-    db.commit()
-
-    return {"reply": bot_reply}
 
 
 # ==============================
 # ✅ Get All Messages in a Chat
 # ==============================
 @router.get("/{conversation_id}/messages")
-def get_conversation_messages(conversation_id: UUID, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    # 🔐 Check if conversation exists
-    convo = db.query(models.Conversation).get(conversation_id)
-    if not convo:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Conversation not found"
-        )
-    # 🔐 Check if conversation belongs to current user
-    if convo.user_id != user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You are not authorized to access this conversation"
+async def get_conversation_messages(
+    conversation_id: UUID,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user)
+):
+    await get_owned_conversation(db, conversation_id, user)
+
+    stmt = select(models.Message).where(models.Message.conversation_id == conversation_id)
+
+    if limit is None and not before and not after:
+        # ✅ Unpaginated callers still get the whole history
+        msgs = (await db.scalars(stmt.order_by(models.Message.created_at))).all()
+    else:
+        # ✅ Keyset page on (created_at, id); only these rows get decrypted
+        msgs, has_more = await keyset_page(
+            db, stmt, models.Message.created_at, models.Message.id,
+            limit or DEFAULT_PAGE_SIZE, before=before, after=after
         )
-    msgs = (
-        db.query(models.Message)
-        .filter(models.Message.conversation_id == conversation_id)
-        .order_by(models.Message.created_at)
-        .all()
-    )
-    
-    response = [
+        if not after:
+            msgs.reverse()
+
+        if msgs:
+            set_cursor_headers(response, msgs[0], msgs[-1], has_more, before, after)
+
+    return [
         {
             "id": str(m.id),
             "role": "assistant" if m.sender in ("assistant", "bot") else "user",
-            "content": decrypt_message(m.encrypted_text),
+            "content": decrypt_stored_message(m),
             "timestamp": m.created_at.astimezone(IST).isoformat()  # ✅ IST for API too
         }
         for m in msgs
     ]
-    
-    return response
 
 # =========================================
 # ✅ Export Chat as WhatsApp-style PDF
 # =========================================
 @router.get("/{conversation_id}/export-pdf")
-def export_conversation_pdf(conversation_id: UUID, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    convo = db.query(models.Conversation).get(conversation_id)
-    if not convo:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Conversation not found"
-        )
-    if convo.user_id != user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You are not authorized to access this conversation"
-        )
-    messages = (
-        db.query(models.Message)
-        .filter_by(conversation_id=conversation_id)
-        .order_by(models.Message.created_at)
-        .all()
-    )
+async def export_conversation_pdf(conversation_id: UUID, db: AsyncSession = Depends(get_db), user: User = Depends(get_current_user)):
+    convo = await get_owned_conversation(db, conversation_id, user)
 
-    # ✅ Convert timestamps to IST before rendering
-    decrypted_msgs = [
-        {
-            "role": "assistant" if m.sender in ("assistant", "bot") else "user",
-            "text": decrypt_message(m.encrypted_text),
-            "time": m.created_at.astimezone(IST).strftime("%I:%M %p"),  # ✅ IST
-        }
-        for m in messages
-    ]
+    async def load_messages():
+        messages = (await db.scalars(
+            select(models.Message)
+            .where(models.Message.conversation_id == conversation_id)
+            .order_by(models.Message.created_at)
+        )).all()
+        # ✅ Convert timestamps to IST before rendering
+        return [
+            {
+                "role": "assistant" if m.sender in ("assistant", "bot") else "user",
+                "text": decrypt_stored_message(m),
+                "time": m.created_at.astimezone(IST).strftime("%I:%M %p"),  # ✅ IST
+            }
+            for m in messages
+        ]
 
-    # ✅ WhatsApp Colors
-    background = "#e5ddd5"
-    assistant_bubble = "#ffffff"
-    user_bubble = "#dcf8c6"
     chat_date = convo.created_at.astimezone(IST).strftime("%d %B %Y")
-    # ✅ Full WhatsApp-like HTML
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-      <meta charset="utf-8">
-      <style>
-        body {{
-          font-family: "Helvetica Neue", sans-serif;
-          background: {background};
-          margin: 0;
-          padding: 20px;
-        }}
-        h2 {{
-          text-align: center;
-          margin-bottom: 20px;
-          color: #333;
-        }}
-        .chat {{
-          display: flex;
-          flex-direction: column;
-          gap: 10px;
-        }}
-        .message {{
-          max-width: 65%;
-          padding: 10px 14px;
-          border-radius: 8px;
-          font-size: 14px;
-          line-height: 1.4;
-          position: relative;
-          word-wrap: break-word;
-        }}
-        .user {{
-          align-self: flex-end;
-          background: {user_bubble};
-          color: #111;
-        }}
-        .assistant {{
-          align-self: flex-start;
-          background: {assistant_bubble};
-          color: #000;
-        }}
-        .timestamp {{
-          font-size: 10px;
-          color: #777;
-          text-align: right;
-          margin-top: 4px;
-        }}
-      </style>
-    </head>
-    <body>
-      <h2>{convo.title}</h2>
-       <p style="text-align:center; font-size:12px; color:#666; margin-top:-10px; margin-bottom:20px;">
-    {chat_date}
-  </p>
-      <div class="chat">
-    """
-
-    for msg in decrypted_msgs:
-        role_class = "user" if msg["role"] == "user" else "assistant"
-        text = msg["text"].replace("\n", "<br>")
-        html_content += f"""
-          <div class="message {role_class}">
-            {text}
-            <div class="timestamp">{msg['time']}</div>
-          </div>
-        """
-
-    html_content += """
-      </div>
-    </body>
-    </html>
-    """
 
-    # ✅ Generate PDF with wkhtmltopdf
-    pdf_path = f"/tmp/conversation_{conversation_id}.pdf"
-    pdfkit.from_string(html_content, pdf_path)
+    # ✅ Served from cache unless the chat changed since the last export
+    pdf_path = await get_conversation_pdf(convo, chat_date, load_messages)
 
     return FileResponse(pdf_path, media_type="application/pdf", filename=f"conversation_{conversation_id}.pdf")
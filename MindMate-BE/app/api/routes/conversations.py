@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 from app.db import models
 from app.schemas import chat as schemas
@@ -7,35 +8,74 @@ from app.db.database import get_db
 from app.dependencies.auth import get_current_user
 from app.db.models import User 
 from fastapi import HTTPException, status
+from app.services.chat_service import get_owned_conversation
+from app.services.summarizer import summary_scheduler
+from app.services.encryption import message_cache
+from app.services.pdf_export import remove_cached_pdfs
 
 router = APIRouter(prefix="/conversations", tags=["conversations"])
 
 @router.get("/", response_model=list[schemas.ConversationOut])
-def list_conversations(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    return db.query(models.Conversation).filter_by(user_id=current_user.id).all()
+async def list_conversations(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    return (await db.scalars(
+        select(models.Conversation).where(models.Conversation.user_id == current_user.id)
+    )).all()
 
 @router.post("/", response_model=schemas.ConversationOut)
-def create_conversation(
+async def create_conversation(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     convo = models.Conversation(user_id=current_user.id)
     db.add(convo)
-    db.commit()
-    db.refresh(convo)
+    await db.commit()
+    await db.refresh(convo)
     return convo
 
 
 
 
+@router.get("/{conversation_id}/summary", response_model=schemas.SummaryStatus)
+async def get_summary_status(
+    conversation_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user)
+):
+    convo = await get_owned_conversation(db, conversation_id, user)
+
+    # ✅ Messages past the high-water mark aren't reflected in the summary yet
+    pending_msgs = (
+        select(func.count())
+        .select_from(models.Message)
+        .where(models.Message.conversation_id == conversation_id)
+    )
+    if convo.summarized_until:
+        pending_msgs = pending_msgs.where(models.Message.created_at > convo.summarized_until)
+
+    stale_seconds = 0.0
+    if convo.updated_at and (not convo.summarized_until or convo.updated_at > convo.summarized_until):
+        stale_seconds = (convo.updated_at - (convo.summarized_until or convo.created_at)).total_seconds()
+
+    return {
+        "conversation_id": convo.id,
+        "summary": convo.summary,
+        "summary_updated_at": convo.summary_updated_at,
+        "summarized_until": convo.summarized_until,
+        "last_message_at": convo.updated_at,
+        "messages_since_summary": await db.scalar(pending_msgs),
+        "stale_seconds": max(stale_seconds, 0.0),
+        "refresh_pending": summary_scheduler.is_pending(convo.id),
+    }
+
+
 @router.patch("/{conversation_id}")
-def rename_conversation(
+async def rename_conversation(
     conversation_id: UUID,
     title: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user)
 ):
-    convo = db.query(models.Conversation).filter_by(id=conversation_id).first()
+    convo = await db.get(models.Conversation, conversation_id)
 
     if convo is None:
         raise HTTPException(
@@ -50,18 +90,18 @@ def rename_conversation(
         )
 
     convo.title = title
-    db.commit()
+    await db.commit()
     return {"message": "Renamed"}
 
 
 
 @router.delete("/{conversation_id}")
-def delete_conversation(
+async def delete_conversation(
     conversation_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user)
 ):
-    convo = db.query(models.Conversation).filter_by(id=conversation_id).first()
+    convo = await db.get(models.Conversation, conversation_id)
 
     if not convo:
         raise HTTPException(
@@ -75,8 +115,10 @@ def delete_conversation(
             detail="You are not authorized to delete this conversation"
         )
 
-    db.delete(convo)
-    db.commit()
+    await db.delete(convo)
+    await db.commit()
+    message_cache.evict_conversation(conversation_id)
+    remove_cached_pdfs(conversation_id)
 
     return {"message": "Deleted"}
 
@@ -1,60 +1,187 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
-from typing import List
+from typing import List, Optional
+from datetime import date
 
 from app.db.database import get_db
 from app.db.models import JournalEntry
 from app.schemas.journal import (
     JournalEntryCreate,
     JournalEntryUpdate,
-    JournalEntryResponse
+    JournalEntryResponse,
+    JournalSearchResponse,
+    JournalEntryImport,
+    JournalRelatedEntry
 )
+from app.schemas.bulk_io import ImportSummary
 from app.dependencies.auth import get_current_user
+from app.services.journal_search import search_entries
+from app.services.journal_similarity import build_vector, vector_for, related_entries
+from app.services.bulk_io import import_rows, export_response, upload_format, FORMAT_PATTERN
+from app.services.pagination import keyset_page, set_cursor_headers, filter_created_between, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 router = APIRouter(prefix="/journal", tags=["Journal"])
 
 # 🔹 Create entry
 @router.post("/", response_model=JournalEntryResponse)
-def create_entry(entry: JournalEntryCreate, db: Session = Depends(get_db), user=Depends(get_current_user)):
+async def create_entry(entry: JournalEntryCreate, db: AsyncSession = Depends(get_db), user=Depends(get_current_user)):
     new_entry = JournalEntry(**entry.dict(), user_id=user.id)
+    new_entry.similarity_vector = vector_for(new_entry)
     db.add(new_entry)
-    db.commit()
-    db.refresh(new_entry)
+    await db.commit()
+    await db.refresh(new_entry)
     return new_entry
 
 # 🔹 Read all entries (user-specific)
 @router.get("/", response_model=List[JournalEntryResponse])
-def get_entries(db: Session = Depends(get_db), user=Depends(get_current_user)):
-    return db.query(JournalEntry).filter(JournalEntry.user_id == user.id).order_by(JournalEntry.created_at.desc()).all()
+async def get_entries(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user)
+):
+    stmt = filter_created_between(
+        select(JournalEntry).where(JournalEntry.user_id == user.id), JournalEntry.created_at, from_date, to_date
+    )
+
+    if limit is None and not before and not after:
+        return (await db.scalars(stmt.order_by(JournalEntry.created_at.desc()))).all()
+
+    # ✅ Keyset page newest first, served by ix_journal_entries_user_created
+    entries, has_more = await keyset_page(
+        db, stmt, JournalEntry.created_at, JournalEntry.id, limit or DEFAULT_PAGE_SIZE, before=before, after=after
+    )
+    if after:
+        entries.reverse()
+    if entries:
+        set_cursor_headers(response, entries[-1], entries[0], has_more, before, after)
+    return entries
+
+# 🔹 Search entries (full-text and/or tags)
+@router.get("/search", response_model=JournalSearchResponse)
+async def search_journal(
+    q: Optional[str] = Query(None, max_length=200),
+    tags: Optional[List[str]] = Query(None),
+    match: str = Query("all", pattern="^(all|any)$"),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user)
+):
+    q = q.strip() if q else None
+    if not q and not tags:
+        raise HTTPException(status_code=400, detail="Provide a search query 'q' and/or 'tags'")
+
+    hits, has_more = await search_entries(db, user.id, q, tags, match == "all", limit, offset)
+    return {
+        "results": [
+            {
+                "id": entry.id,
+                "title": entry.title,
+                "description": entry.description,
+                "mood": entry.mood,
+                "tags": entry.tags,
+                "created_at": entry.created_at,
+                "rank": rank,
+                "snippet": snippet,
+            }
+            for entry, rank, snippet in hits
+        ],
+        "next_offset": offset + limit if has_more else None,
+    }
+
+# 🔹 Bulk import (NDJSON or CSV)
+@router.post("/import", response_model=ImportSummary)
+async def import_entries(
+    request: Request,
+    format: Optional[str] = Query(None, pattern=FORMAT_PATTERN),
+    user=Depends(get_current_user)
+):
+    def to_row(item):
+        row = item.dict(exclude={"created_at"})
+        row["tags"] = row["tags"] or []
+        row["similarity_vector"] = build_vector(row["title"], row["description"], row["tags"])
+        return row
+
+    return await import_rows(request, upload_format(request, format), JournalEntryImport, user.id, JournalEntry, to_row)
+
+# 🔹 Bulk export (streamed oldest first)
+@router.get("/export")
+async def export_entries(
+    format: str = Query("ndjson", pattern=FORMAT_PATTERN),
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    user=Depends(get_current_user)
+):
+    stmt = filter_created_between(
+        select(JournalEntry).where(JournalEntry.user_id == user.id), JournalEntry.created_at, from_date, to_date
+    ).order_by(JournalEntry.created_at, JournalEntry.id)
+    return export_response(
+        stmt, ["id", "title", "description", "mood", "tags", "created_at"], format, "journal",
+        # Same "a;b;c" tag cell that CSV import accepts
+        csv_values=lambda column, value: ";".join(value or []) if column == "tags" else value,
+    )
 
 # 🔹 Read single entry
 @router.get("/{entry_id}", response_model=JournalEntryResponse)
-def get_entry(entry_id: UUID, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    entry = db.query(JournalEntry).filter(JournalEntry.id == entry_id, JournalEntry.user_id == user.id).first()
+async def get_entry(entry_id: UUID, db: AsyncSession = Depends(get_db), user=Depends(get_current_user)):
+    entry = await db.scalar(select(JournalEntry).where(JournalEntry.id == entry_id, JournalEntry.user_id == user.id))
     if not entry:
         raise HTTPException(status_code=404, detail="Journal entry not found")
     return entry
 
+# 🔹 Related entries (local TF-IDF similarity, no LLM call)
+@router.get("/{entry_id}/related", response_model=List[JournalRelatedEntry])
+async def get_related_entries(
+    entry_id: UUID,
+    k: int = Query(5, ge=1, le=50),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user)
+):
+    related = await related_entries(db, user.id, entry_id, k)
+    if related is None:
+        raise HTTPException(status_code=404, detail="Journal entry not found")
+    return [
+        {
+            "id": other.id,
+            "title": other.title,
+            "description": other.description,
+            "mood": other.mood,
+            "tags": other.tags,
+            "created_at": other.created_at,
+            "score": round(score, 4),
+        }
+        for other, score in related
+    ]
+
 # 🔹 Update
 @router.put("/{entry_id}", response_model=JournalEntryResponse)
-def update_entry(entry_id: UUID, updates: JournalEntryUpdate, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    entry = db.query(JournalEntry).filter(JournalEntry.id == entry_id, JournalEntry.user_id == user.id).first()
+async def update_entry(entry_id: UUID, updates: JournalEntryUpdate, db: AsyncSession = Depends(get_db), user=Depends(get_current_user)):
+    entry = await db.scalar(select(JournalEntry).where(JournalEntry.id == entry_id, JournalEntry.user_id == user.id))
     if not entry:
         raise HTTPException(status_code=404, detail="Journal entry not found")
 
-    for key, value in updates.dict(exclude_unset=True).items():
+    changes = updates.dict(exclude_unset=True)
+    for key, value in changes.items():
         setattr(entry, key, value)
-    
-    db.commit()
-    db.refresh(entry)
+    if changes.keys() & {"title", "description", "tags"}:
+        entry.similarity_vector = vector_for(entry)
+
+    await db.commit()
+    await db.refresh(entry)
     return entry
 
 # 🔹 Delete
 @router.delete("/{entry_id}", status_code=204)
-def delete_entry(entry_id: UUID, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    entry = db.query(JournalEntry).filter(JournalEntry.id == entry_id, JournalEntry.user_id == user.id).first()
+async def delete_entry(entry_id: UUID, db: AsyncSession = Depends(get_db), user=Depends(get_current_user)):
+    entry = await db.scalar(select(JournalEntry).where(JournalEntry.id == entry_id, JournalEntry.user_id == user.id))
     if not entry:
         raise HTTPException(status_code=404, detail="Journal entry not found")
-    db.delete(entry)
-    db.commit()
+    await db.delete(entry)
+    await db.commit()
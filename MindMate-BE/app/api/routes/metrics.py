@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends
+from app.core.security import get_hashing_stats
+from app.db.database import get_pool_stats
+from app.dependencies.auth import get_user_cache_stats, require_metrics_token
+from app.services import gpt_client, pdf_export, google_oauth, rate_limit, topic_classifier, conversation_lock, idempotency, bulk_io, journal_similarity
+from app.services.summarizer import summary_scheduler
+from app.services.encryption import message_cache
+from app.services.mail_outbox import mail_outbox
+
+# ✅ Operational internals; only scrapers holding METRICS_TOKEN get in
+router = APIRouter(
+    prefix="/metrics",
+    tags=["Metrics"],
+    dependencies=[Depends(require_metrics_token)],
+    include_in_schema=False
+)
+
+@router.get("/")
+def get_metrics():
+    return {
+        "db_pool": get_pool_stats(),
+        "auth_user_cache": get_user_cache_stats(),
+        "rate_limit": rate_limit.get_stats(),
+        "password_hashing": get_hashing_stats(),
+        "llm": gpt_client.get_stats(),
+        "topic_routing": topic_classifier.get_stats(),
+        "google_oauth": google_oauth.get_stats(),
+        "conversation_locks": conversation_lock.get_stats(),
+        "idempotency": idempotency.get_stats(),
+        "summaries": summary_scheduler.get_stats(),
+        "decrypted_messages": message_cache.get_stats(),
+        "pdf_export": pdf_export.get_stats(),
+        "mail_outbox": mail_outbox.get_stats(),
+        "bulk_io": bulk_io.get_stats(),
+        "journal_similarity": journal_similarity.get_stats(),
+    }
@@ -1,63 +1,147 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models import MoodLog
-from app.schemas.mood import MoodLogCreate, MoodLogUpdate, MoodLogResponse
+from app.schemas.mood import MoodLogCreate, MoodLogUpdate, MoodLogResponse, MoodStats, MoodLogImport
+from app.schemas.bulk_io import ImportSummary
+from app.services.mood_stats import record_mood, record_moods, get_mood_stats
+from app.services.bulk_io import import_rows, export_response, upload_format, FORMAT_PATTERN
+from app.services.pagination import keyset_page, set_cursor_headers, filter_created_between, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from app.dependencies.auth import get_current_user
 from app.db.database import get_db
 from uuid import UUID
-from typing import List
+from typing import List, Optional
+from datetime import date, datetime
 
 router = APIRouter(prefix="/mood", tags=["Mood Logs"])
 
 @router.post("/", response_model=MoodLogResponse)
-def create_mood_log(payload: MoodLogCreate, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    mood_log = MoodLog(mood=payload.mood, user_id=user.id)
+async def create_mood_log(payload: MoodLogCreate, db: AsyncSession = Depends(get_db), user=Depends(get_current_user)):
+    mood_log = MoodLog(mood=payload.mood, user_id=user.id, created_at=datetime.utcnow())
     db.add(mood_log)
-    db.commit()
-    db.refresh(mood_log)
+    # ✅ Rollup is updated in the same transaction as the log
+    await record_mood(db, user.id, mood_log.created_at, mood_log.mood)
+    await db.commit()
+    await db.refresh(mood_log)
     return mood_log
 
 @router.get("/", response_model=List[MoodLogResponse])
-def get_mood_logs(db: Session = Depends(get_db), user=Depends(get_current_user)):
-    return db.query(MoodLog).filter(MoodLog.user_id == user.id).order_by(MoodLog.created_at.desc()).all()
+async def get_mood_logs(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user)
+):
+    stmt = filter_created_between(
+        select(MoodLog).where(MoodLog.user_id == user.id), MoodLog.created_at, from_date, to_date
+    )
+
+    if limit is None and not before and not after:
+        # ✅ Unpaginated callers still get the whole (filtered) history
+        return (await db.scalars(stmt.order_by(MoodLog.created_at.desc()))).all()
+
+    # ✅ Keyset page newest first, served by ix_mood_logs_user_created
+    logs, has_more = await keyset_page(
+        db, stmt, MoodLog.created_at, MoodLog.id, limit or DEFAULT_PAGE_SIZE, before=before, after=after
+    )
+    if after:
+        logs.reverse()
+    if logs:
+        set_cursor_headers(response, logs[-1], logs[0], has_more, before, after)
+    return logs
 
 @router.get("/latest", response_model=MoodLogResponse)
-def get_latest_mood_log(db: Session = Depends(get_db), user=Depends(get_current_user)):
-    latest_log = (
-        db.query(MoodLog)
-        .filter(MoodLog.user_id == user.id)
+async def get_latest_mood_log(db: AsyncSession = Depends(get_db), user=Depends(get_current_user)):
+    latest_log = await db.scalar(
+        select(MoodLog)
+        .where(MoodLog.user_id == user.id)
         .order_by(MoodLog.created_at.desc())
-        .first()
+        .limit(1)
     )
     if not latest_log:
         raise HTTPException(status_code=404, detail="No mood logs found")
     return latest_log
 
+@router.get("/stats", response_model=MoodStats)
+async def get_mood_log_stats(
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user)
+):
+    # ✅ Aggregated from per-day rollups, so cost doesn't grow with the number of logs
+    if from_date and to_date and from_date > to_date:
+        raise HTTPException(status_code=400, detail="'from' must be on or before 'to'")
+    return await get_mood_stats(db, user.id, from_date, to_date)
+
+@router.post("/import", response_model=ImportSummary)
+async def import_mood_logs(
+    request: Request,
+    format: Optional[str] = Query(None, pattern=FORMAT_PATTERN),
+    user=Depends(get_current_user)
+):
+    """NDJSON or CSV (header: mood,created_at) upload; bad rows are reported, not fatal."""
+    async def update_rollups(db, rows):
+        await record_moods(db, user.id, [(row["created_at"], row["mood"]) for row in rows])
+
+    return await import_rows(
+        request, upload_format(request, format), MoodLogImport, user.id, MoodLog,
+        to_row=lambda item: {"mood": item.mood},
+        after_batch=update_rollups,
+    )
+
+@router.get("/export")
+async def export_mood_logs(
+    format: str = Query("ndjson", pattern=FORMAT_PATTERN),
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    user=Depends(get_current_user)
+):
+    stmt = filter_created_between(
+        select(MoodLog).where(MoodLog.user_id == user.id), MoodLog.created_at, from_date, to_date
+    ).order_by(MoodLog.created_at, MoodLog.id)
+    return export_response(stmt, ["id", "mood", "created_at"], format, "mood-logs")
+
 @router.get("/{mood_id}", response_model=MoodLogResponse)
-def get_single_mood_log(mood_id: UUID, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    log = db.query(MoodLog).filter(MoodLog.id == mood_id, MoodLog.user_id == user.id).first()
+async def get_single_mood_log(mood_id: UUID, db: AsyncSession = Depends(get_db), user=Depends(get_current_user)):
+    log = await db.scalar(select(MoodLog).where(MoodLog.id == mood_id, MoodLog.user_id == user.id))
     if not log:
         raise HTTPException(status_code=404, detail="Mood log not found")
     return log
 
 @router.put("/{mood_id}", response_model=MoodLogResponse)
-def update_mood_log(mood_id: UUID, payload: MoodLogUpdate, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    log = db.query(MoodLog).filter(MoodLog.id == mood_id, MoodLog.user_id == user.id).first()
+async def update_mood_log(mood_id: UUID, payload: MoodLogUpdate, db: AsyncSession = Depends(get_db), user=Depends(get_current_user)):
+    # ✅ Locked so the rollup reconciler can't fold this log while it changes
+    log = await db.scalar(
+        select(MoodLog).where(MoodLog.id == mood_id, MoodLog.user_id == user.id).with_for_update()
+    )
     if not log:
         raise HTTPException(status_code=404, detail="Mood log not found")
+    # Logs the rollups don't count yet (in_rollup false) are folded in later with their new mood
+    if payload.mood is not None and payload.mood != log.mood and log.in_rollup is not False:
+        await record_mood(db, user.id, log.created_at, log.mood, sign=-1)
+        await record_mood(db, user.id, log.created_at, payload.mood)
     if payload.mood is not None:
         log.mood = payload.mood
-    db.commit()
-    db.refresh(log)
+    await db.commit()
+    await db.refresh(log)
     return log
 
 @router.delete("/{mood_id}")
-def delete_mood_log(mood_id: UUID, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    log = db.query(MoodLog).filter(MoodLog.id == mood_id, MoodLog.user_id == user.id).first()
+async def delete_mood_log(mood_id: UUID, db: AsyncSession = Depends(get_db), user=Depends(get_current_user)):
+    log = await db.scalar(
+        select(MoodLog).where(MoodLog.id == mood_id, MoodLog.user_id == user.id).with_for_update()
+    )
     if not log:
         raise HTTPException(status_code=404, detail="Mood log not found")
-    db.delete(log)
-    db.commit()
+    if log.in_rollup is not False:
+        await record_mood(db, user.id, log.created_at, log.mood, sign=-1)
+    await db.delete(log)
+    await db.commit()
     return {"message": "Mood log deleted successfully"}
 
 
@@ -1,16 +1,15 @@
 # app/routes/user.py
 
-from fastapi import APIRouter, Depends
-from app.dependencies.auth import get_current_user
+from fastapi import APIRouter, Depends, HTTPException
+from app.dependencies.auth import get_current_user, invalidate_cached_user
 from app.db.models import User 
 from app.db.database import get_db
 from app.schemas.user import UserUpdateRequest
-from sqlalchemy.orm import Session
-from uuid import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
 router = APIRouter(prefix="/user", tags=["User"])
 
 @router.get("/me")
-def get_my_profile(current_user: User = Depends(get_current_user)):
+async def get_my_profile(current_user: User = Depends(get_current_user)):
     return {
         "id": str(current_user.id),  # UUID needs to be converted to string
         "email": current_user.email,
@@ -20,13 +19,13 @@ def get_my_profile(current_user: User = Depends(get_current_user)):
     }
 
 @router.put("/me")
-def update_my_profile(
+async def update_my_profile(
     updates: UserUpdateRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
 
-    user = db.query(User).filter(User.id == current_user.id).first()
+    user = await db.get(User, current_user.id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     # Update only provided fields
@@ -38,8 +37,9 @@ def update_my_profile(
         user.is_active = updates.is_active
 
     # No need to call db.add(current_user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    await invalidate_cached_user(user.email)
 
     return {
         "message": "Profile updated successfully",
@@ -2,10 +2,40 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 30000  # 0 disables
+    MIGRATION_LOCK_TIMEOUT_MS: int = 5000  # alembic DDL gives up rather than queueing traffic behind it
+
+    METRICS_TOKEN: str = ""  # bearer token for /metrics/; empty disables the endpoint
+
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
     REFRESH_TOKEN_EXPIRE_DAYS: int
+    REFRESH_SESSION_PURGE_INTERVAL_SECONDS: float = 3600.0
+    REFRESH_SESSION_PURGE_BATCH: int = 1000
+
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 32
+
+    CACHE_BACKEND: str = "memory"  # or "redis"
+    REDIS_URL: str = "redis://localhost:6379/0"
+    AUTH_USER_CACHE_TTL_SECONDS: float = 60.0
+    AUTH_USER_CACHE_MAX_ENTRIES: int = 10000
+
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_TRUST_FORWARDED: bool = False  # only behind a proxy that appends X-Forwarded-For (the k8s ingress)
+    RATE_LIMIT_CHAT_BURST: int = 5
+    RATE_LIMIT_CHAT_PER_MINUTE: float = 10.0
+    RATE_LIMIT_LOGIN_BURST: int = 10
+    RATE_LIMIT_LOGIN_PER_MINUTE: float = 5.0
+    RATE_LIMIT_FORGOT_PASSWORD_BURST: int = 3
+    RATE_LIMIT_FORGOT_PASSWORD_PER_MINUTE: float = 1.0
 
     MAIL_USERNAME: str
     MAIL_PASSWORD: str
@@ -14,13 +44,64 @@ class Settings(BaseSettings):
     MAIL_SERVER: str
     MAIL_TLS: bool = True
     MAIL_SSL: bool = False
+    MAIL_TIMEOUT_SECONDS: float = 10.0
+    MAIL_QUEUE_MAX_SIZE: int = 1000
+    MAIL_BATCH_SIZE: int = 20
+    MAIL_MAX_ATTEMPTS: int = 4
+    MAIL_RETRY_BACKOFF_SECONDS: float = 2.0
+    MAIL_IDLE_TIMEOUT_SECONDS: float = 60.0
+    MAIL_SHUTDOWN_GRACE_SECONDS: float = 5.0
 
     GOOGLE_CLIENT_ID: str
     GOOGLE_CLIENT_SECRET: str
     GOOGLE_REDIRECT_URI: str
+    GOOGLE_HTTP_TIMEOUT_SECONDS: float = 10.0
+    GOOGLE_HTTP_CONNECT_TIMEOUT_SECONDS: float = 3.0
+    GOOGLE_HTTP_MAX_CONNECTIONS: int = 20
+    GOOGLE_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    GOOGLE_CERTS_DEFAULT_TTL_SECONDS: float = 3600.0
 
     OPENAI_API_KEY: str
+    OPENAI_MODEL: str = "gpt-4o"
+    OPENAI_TIMEOUT_SECONDS: float = 60.0
+    OPENAI_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    OPENAI_MAX_RETRIES: int = 2
+    OPENAI_MAX_CONNECTIONS: int = 100
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    OPENAI_MAX_CONCURRENCY: int = 50
+
+    # "shadow" only logs what would be refused; switch to "enforce" once the routing logs look right
+    TOPIC_CLASSIFIER_MODE: str = "shadow"  # "off" | "shadow" | "enforce"
+    TOPIC_OFF_TOPIC_THRESHOLD: float = 3.0
+    CHAT_CONTEXT_WINDOW: int = 40  # most recent turns loaded; the token budget decides how many are sent
+    CHAT_CONTEXT_TOKEN_BUDGET: int = 3000
+    CHAT_SEND_LOCK_WAIT_SECONDS: float = 30.0
+    CHAT_SEND_LOCK_TTL_SECONDS: float = 120.0  # Redis lock expiry, outlasts a slow reply
+    IDEMPOTENCY_TTL_SECONDS: float = 86400.0
+    IDEMPOTENCY_PENDING_TTL_SECONDS: float = 30.0  # refreshed while the request runs; frees the key if its process dies
+    IDEMPOTENCY_WAIT_SECONDS: float = 60.0
+    IDEMPOTENCY_POLL_SECONDS: float = 0.5
+    IDEMPOTENCY_MAX_ENTRIES: int = 50000
+    SUMMARY_DEBOUNCE_SECONDS: float = 2.0
+    SUMMARY_MAX_NEW_MESSAGES: int = 20
+
+    USER_TIMEZONE: str = "Asia/Kolkata"  # calendar days for mood stats and date filters
+    MOOD_STATS_DEFAULT_DAYS: int = 90
+    MOOD_ROLLUP_RECONCILE_INTERVAL_SECONDS: float = 60.0
+    MOOD_ROLLUP_RECONCILE_BATCH: int = 1000
+
+    IMPORT_BATCH_SIZE: int = 1000  # rows per multi-row INSERT / transaction
+    IMPORT_MAX_ROWS: int = 100000
+    IMPORT_MAX_REPORTED_ERRORS: int = 100
+    EXPORT_FETCH_SIZE: int = 500  # rows per server-side cursor fetch
+
+    PDF_RENDERER: str = "wkhtmltopdf"  # or "weasyprint"
+    PDF_RENDER_WORKERS: int = 2
+    PDF_RENDER_MAX_QUEUE: int = 8
+    PDF_CACHE_DIR: str = "/tmp/mindmate-pdf-cache"
+
     CHAT_ENCRYPTION_KEY: str
+    DECRYPTED_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
 
 
     class Config:
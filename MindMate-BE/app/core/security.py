@@ -3,10 +3,37 @@ from jose import jwt
 from datetime import datetime, timedelta
 from app.core.config import settings
 from typing import Optional
+import asyncio
 import secrets
-from sqlalchemy.orm import Session
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db import models
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# ✅ Hashes made with any other cost are flagged by needs_update and rehashed on login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+# ✅ bcrypt gets its own workers so a login burst can't starve the shared threadpool
+_hash_pool = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="bcrypt"
+)
+_hash_slots = asyncio.Semaphore(settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_MAX_QUEUE)
+_hash_stats = {
+    "completed": 0,
+    "rejected": 0,
+    "in_flight": 0,
+    "rehashed": 0,
+    "total_queue_ms": 0.0,
+    "total_hash_ms": 0.0,
+}
 
 def create_password_reset_token(email: str) -> str:
     expire = datetime.utcnow() + timedelta(minutes=15)  # expires in 15 min
@@ -29,6 +56,63 @@ def hash_password(password: str):
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+async def _run_hashing(fn, *args):
+    """Run bcrypt work on the hashing pool, or 429 if its queue is already full."""
+    if _hash_slots.locked():
+        _hash_stats["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many sign-in attempts right now, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
+
+    queued = time.perf_counter()
+    async with _hash_slots:
+        _hash_stats["in_flight"] += 1
+        try:
+            result, hash_ms = await asyncio.get_running_loop().run_in_executor(_hash_pool, _timed, fn, *args)
+        finally:
+            _hash_stats["in_flight"] -= 1
+
+    _hash_stats["completed"] += 1
+    _hash_stats["total_hash_ms"] += hash_ms
+    _hash_stats["total_queue_ms"] += max((time.perf_counter() - queued) * 1000 - hash_ms, 0.0)
+    return result
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hashing(pwd_context.hash, password)
+
+
+async def verify_and_update_password(plain_password, hashed_password):
+    """Returns `(valid, new_hash)`; `new_hash` is set when the stored cost is outdated."""
+    valid, new_hash = await _run_hashing(pwd_context.verify_and_update, plain_password, hashed_password)
+    if valid and new_hash:
+        _hash_stats["rehashed"] += 1
+    return valid, new_hash
+
+
+def get_hashing_stats():
+    completed = _hash_stats["completed"]
+    return {
+        **_hash_stats,
+        "workers": settings.PASSWORD_HASH_WORKERS,
+        "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+        "avg_queue_ms": round(_hash_stats["total_queue_ms"] / completed, 2) if completed else 0.0,
+        "avg_hash_ms": round(_hash_stats["total_hash_ms"] / completed, 2) if completed else 0.0,
+    }
+
+
+def shutdown_hashing():
+    _hash_pool.shutdown(wait=False, cancel_futures=True)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -44,7 +128,7 @@ def create_refresh_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def create_password_reset_token_for_db(db: Session, user, expiry_minutes=15):
+async def create_password_reset_token_for_db(db: AsyncSession, user, expiry_minutes=15):
     # ✅ Generate secure random token
     raw_token = secrets.token_urlsafe(32)
 
@@ -59,7 +143,6 @@ def create_password_reset_token_for_db(db: Session, user, expiry_minutes=15):
         used=False
     )
     db.add(reset_token)
-    db.commit()
-    db.refresh(reset_token)
+    await db.commit()
 
     return raw_token  # Send this in email
\ No newline at end of file
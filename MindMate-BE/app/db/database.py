@@ -1,15 +1,82 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+import time
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
 
-engine = create_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def _async_database_url(url: str):
+    """Point a plain postgres:// DATABASE_URL at the asyncpg driver."""
+    db_url = make_url(url)
+    if db_url.drivername in ("postgres", "postgresql", "postgresql+psycopg2"):
+        db_url = db_url.set(drivername="postgresql+asyncpg")
+
+    # ✅ asyncpg spells libpq's sslmode as ssl
+    if "sslmode" in db_url.query:
+        query = dict(db_url.query)
+        query["ssl"] = query.pop("sslmode")
+        db_url = db_url.set(query=query)
+    return db_url
+
+
+_pool_stats = {
+    "checkouts": 0,
+    "timeouts": 0,
+    "total_wait_ms": 0.0,
+    "max_wait_ms": 0.0,
+}
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long callers wait to get a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            _pool_stats["timeouts"] += 1
+            raise
+        finally:
+            waited_ms = (time.perf_counter() - started) * 1000
+            _pool_stats["checkouts"] += 1
+            _pool_stats["total_wait_ms"] += waited_ms
+            _pool_stats["max_wait_ms"] = max(_pool_stats["max_wait_ms"], waited_ms)
+
+
+_connect_args = {}
+if settings.DB_STATEMENT_TIMEOUT_MS:
+    _connect_args["server_settings"] = {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}
+
+engine = create_async_engine(
+    _async_database_url(settings.DATABASE_URL),
+    poolclass=InstrumentedPool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+    pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    connect_args=_connect_args,
+)
+SessionLocal = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
+
+
+def get_pool_stats():
+    pool = engine.pool
+    checkouts = _pool_stats["checkouts"]
+    return {
+        "size": pool.size(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),  # SQLAlchemy reports a negative count until the pool fills
+        **_pool_stats,
+        "avg_wait_ms": round(_pool_stats["total_wait_ms"] / checkouts, 3) if checkouts else 0.0,
+    }
@@ -0,0 +1,37 @@
+from alembic import op
+from sqlalchemy import text
+
+# Helpers for alembic/versions revisions that touch large, live tables.
+
+
+def create_index_concurrently(name: str, table: str, columns: list, **kw):
+    """
+    CREATE INDEX CONCURRENTLY outside the revision's transaction, so writes
+    keep flowing while it builds. A build that failed earlier leaves an
+    INVALID index behind; that one is dropped and rebuilt.
+    """
+    context = op.get_context()
+    with context.autocommit_block():
+        if context.as_sql:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True, **kw)
+            return
+
+        bind = op.get_bind()
+        invalid = bind.scalar(
+            text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"), {"name": name}
+        )
+        if invalid:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+        # ✅ The build only waits for in-flight transactions and doesn't block writes, so let it wait
+        previous_lock_timeout = bind.scalar(text("SHOW lock_timeout"))
+        bind.execute(text("SET lock_timeout = 0"))
+        try:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True, **kw)
+        finally:
+            bind.execute(text(f"SET lock_timeout = '{previous_lock_timeout}'"))
+
+
+def drop_index_concurrently(name: str, table: str):
+    with op.get_context().autocommit_block():
+        op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -1,9 +1,9 @@
 from app.db.database import Base
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean,TIMESTAMP,Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean,TIMESTAMP,Text,Index,Date,LargeBinary,text,false,FetchedValue
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 import uuid
-from sqlalchemy.dialects.postgresql import UUID,ARRAY
+from sqlalchemy.dialects.postgresql import UUID,ARRAY,TSVECTOR
 
 
 class User(Base):
@@ -22,7 +22,7 @@ class User(Base):
     last_name = Column(String, nullable=True)
 
     created_at = Column(TIMESTAMP, default=datetime.utcnow)
-    conversations = relationship("Conversation", back_populates="user")
+    conversations = relationship("Conversation", back_populates="user", passive_deletes=True)
 
 
 class PasswordResetToken(Base):
@@ -37,6 +37,22 @@ class PasswordResetToken(Base):
     user = relationship("User", backref="reset_tokens")
 
 
+class RefreshSession(Base):
+    __tablename__ = "refresh_sessions"
+
+    # ✅ id doubles as the refresh JWT's jti; one row per issued token
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    family_id = Column(UUID(as_uuid=True), nullable=False, index=True)  # one family per device login
+    token_hash = Column(String(64), nullable=False)
+    device = Column(String, nullable=True)
+
+    created_at = Column(TIMESTAMP, default=datetime.utcnow)
+    expires_at = Column(TIMESTAMP, nullable=False, index=True)
+    rotated_at = Column(TIMESTAMP, nullable=True)
+    revoked_at = Column(TIMESTAMP, nullable=True)
+
+
 class Conversation(Base):
     __tablename__ = "conversations"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -47,9 +63,14 @@ class Conversation(Base):
     
     # ✅ NEW: Store short memory summary of conversation
     summary = Column(Text, nullable=True)
+    summary_updated_at = Column(TIMESTAMP, nullable=True)
+    # ✅ High-water mark: (created_at, id) of the newest message folded into `summary`
+    summarized_until = Column(TIMESTAMP, nullable=True)
+    summarized_until_id = Column(UUID(as_uuid=True), nullable=True)
 
     user = relationship("User", back_populates="conversations")
-    messages = relationship("Message", back_populates="conversation")
+    # ✅ Let the FK's ON DELETE CASCADE remove messages instead of loading them first
+    messages = relationship("Message", back_populates="conversation", passive_deletes=True)
 
 
 class Message(Base):
@@ -62,6 +83,11 @@ class Message(Base):
 
     conversation = relationship("Conversation", back_populates="messages")
 
+    __table_args__ = (
+        # ✅ Serves "latest N messages of a conversation" without a sort
+        Index("ix_messages_conversation_created", "conversation_id", "created_at"),
+    )
+
 
 class MoodLog(Base):
     __tablename__ = "mood_logs"
@@ -69,11 +95,38 @@ class MoodLog(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     mood = Column(Integer, nullable=False)  # 1 to 5
     created_at = Column(TIMESTAMP, default=datetime.utcnow)
+    # ✅ Whether mood_daily_rollups counts this log: True when written with its rollup,
+    # NULL for logs that predate rollups (counted by migration 0007), false for logs
+    # written by a release that doesn't maintain rollups (folded in by the reconciler)
+    in_rollup = Column(Boolean, nullable=True, default=True, server_default=false())
 
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
 
     user = relationship("User", backref="mood_logs")
 
+    __table_args__ = (
+        # ✅ Per-user listings newest first, and date-range filters
+        Index("ix_mood_logs_user_created", "user_id", "created_at"),
+        Index("ix_mood_logs_pending_rollup", "id", postgresql_where=text("in_rollup = false")),
+    )
+
+
+class MoodDailyRollup(Base):
+    """Per-user, per-day mood totals, kept in step with mood_logs on every write."""
+    __tablename__ = "mood_daily_rollups"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)  # local day in USER_TIMEZONE
+
+    count = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=False, default=0)
+    # ✅ One counter per mood value (1-5) for distributions
+    count_1 = Column(Integer, nullable=False, default=0)
+    count_2 = Column(Integer, nullable=False, default=0)
+    count_3 = Column(Integer, nullable=False, default=0)
+    count_4 = Column(Integer, nullable=False, default=0)
+    count_5 = Column(Integer, nullable=False, default=0)
+
 class JournalEntry(Base):
     __tablename__ = "journal_entries"
 
@@ -83,8 +136,19 @@ class JournalEntry(Base):
     mood = Column(Integer, nullable=True)  # 1 to 5
     tags = Column(ARRAY(String), default=[])
 
+    # ✅ Maintained by Postgres itself (trigger from migration 0009); title matches rank above description matches
+    search_vector = Column(TSVECTOR, server_default=FetchedValue(), server_onupdate=FetchedValue())
+    # ✅ Sparse hashed term weights for /journal/{id}/related; only loaded when asked for
+    similarity_vector = deferred(Column(LargeBinary, nullable=True))
+
     created_at = Column(TIMESTAMP, default=datetime.utcnow)
 
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
 
-    user = relationship("User", backref="journal_entries")
\ No newline at end of file
+    user = relationship("User", backref="journal_entries")
+
+    __table_args__ = (
+        Index("ix_journal_entries_user_created", "user_id", "created_at"),
+        Index("ix_journal_entries_search", "search_vector", postgresql_using="gin"),
+        Index("ix_journal_entries_tags", "tags", postgresql_using="gin"),
+    )
@@ -1,26 +1,69 @@
 # app/dependencies/auth.py
 
-from fastapi import Depends, HTTPException, status
+import hmac
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from datetime import datetime
+from uuid import UUID
 from app.core.config import settings
-from sqlalchemy.orm import Session
-from app.db.database import SessionLocal
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from app.db.database import get_db
 from app.db.models import User
+from app.services.cache import make_store
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# ✅ Short-lived principal cache keyed on the token subject (email)
+_user_cache = make_store("principal", maxsize=settings.AUTH_USER_CACHE_MAX_ENTRIES)
+_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+# Profile columns kept in the cache; secrets like password hashes never are
+_CACHED_COLUMNS = (
+    "email", "is_verified", "is_active", "auth_provider",
+    "is_google_linked", "first_name", "last_name",
+)
+
+
+def _user_to_cache(user: User) -> dict:
+    data = {column: getattr(user, column) for column in _CACHED_COLUMNS}
+    data["id"] = str(user.id)
+    data["created_at"] = user.created_at.isoformat() if user.created_at else None
+    return data
+
+
+def _user_from_cache(data: dict) -> User:
+    user = User(
+        id=UUID(data["id"]),
+        created_at=datetime.fromisoformat(data["created_at"]) if data["created_at"] else None,
+        **{column: data[column] for column in _CACHED_COLUMNS}
+    )
+    # ✅ Behaves like a loaded-then-detached row; routes that write re-fetch it by id
+    make_transient_to_detached(user)
+    return user
+
 
-def get_current_user(
+async def invalidate_cached_user(email: str):
+    """Drop a cached principal after its profile, password or session changes."""
+    _cache_stats["invalidations"] += 1
+    await _user_cache.delete(email)
+
+
+def get_user_cache_stats():
+    lookups = _cache_stats["hits"] + _cache_stats["misses"]
+    return {
+        **_cache_stats,
+        "backend": settings.CACHE_BACKEND,
+        "ttl_seconds": settings.AUTH_USER_CACHE_TTL_SECONDS,
+        "hit_rate": round(_cache_stats["hits"] / lookups, 4) if lookups else 0.0,
+    }
+
+
+async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -39,12 +82,31 @@ def get_current_user(
         if datetime.utcfromtimestamp(exp) < datetime.utcnow():
             raise HTTPException(status_code=401, detail="Token has expired")
 
-        user = db.query(User).filter(User.email == email).first()
+        cached = await _user_cache.get(email)
+        if cached is not None:
+            _cache_stats["hits"] += 1
+            return _user_from_cache(cached)
+
+        _cache_stats["misses"] += 1
+        user = await db.scalar(select(User).where(User.email == email))
 
         if user is None:
             raise HTTPException(status_code=404, detail="User not found")
 
+        await _user_cache.set(email, _user_to_cache(user), settings.AUTH_USER_CACHE_TTL_SECONDS)
         return user
 
     except JWTError:
         raise credentials_exception
+
+
+def require_metrics_token(request: Request):
+    """
+    /metrics/ is served on the public API host, so it needs its own shared
+    secret (METRICS_TOKEN). Unset means the endpoint doesn't exist.
+    """
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
@@ -1,14 +1,47 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.api.routes import auth,user,mood,journal,chat,conversations
-from app.db.database import Base, engine
+from app.api.routes import auth,user,mood,journal,chat,conversations,metrics
+from app.db.database import engine
+from app.services import gpt_client, pdf_export, google_oauth, token_counter
+from app.services.summarizer import summary_scheduler
+from app.services.cache import close_redis
+from app.services.token_store import run_session_purger
+from app.services.mail_outbox import mail_outbox
+from app.services.mood_stats import run_rollup_reconciler
+from app.services.rate_limit import RateLimitMiddleware
+from app.core.security import shutdown_hashing
+from app.services.pagination import BEFORE_CURSOR_HEADER, AFTER_CURSOR_HEADER
+from app.services.idempotency import REPLAYED_HEADER
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # ✅ Tables come from `alembic upgrade head`, run once per release before rollout
+    # ✅ Load the tokenizer off the event loop before the first chat needs it
+    await token_counter.warm_up()
+    # ✅ Expired refresh sessions are swept in the background
+    purger = asyncio.create_task(run_session_purger())
+    # ✅ Folds in mood logs written by pods that don't maintain rollups (mid-rollout)
+    reconciler = asyncio.create_task(run_rollup_reconciler())
+    mail_outbox.start()
+    yield
+    purger.cancel()
+    reconciler.cancel()
+    await mail_outbox.shutdown()
+    await summary_scheduler.shutdown()
+    pdf_export.shutdown()
+    shutdown_hashing()
+    # ✅ Release pooled keep-alive connections on shutdown
+    await gpt_client.close_client()
+    await google_oauth.close_client()
+    await close_redis()
+    await engine.dispose()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # 👇 Allow specific origins (e.g., your frontend server)
 origins = [
@@ -17,6 +50,9 @@ origins = [
     "http://localhost:3000",  # if you're using React
 ]
 
+# ✅ Token-bucket limits on expensive routes; added before CORS so 429s still carry CORS headers
+app.add_middleware(RateLimitMiddleware)
+
 # 👇 Enable CORS
 app.add_middleware(
     CORSMiddleware,
@@ -24,6 +60,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[BEFORE_CURSOR_HEADER, AFTER_CURSOR_HEADER, "Retry-After", REPLAYED_HEADER],  # ✅ pagination cursors, rate limits, idempotent replays
 )
 
 @app.exception_handler(RequestValidationError)
@@ -62,4 +99,5 @@ app.include_router(user.router)
 app.include_router(mood.router)
 app.include_router(journal.router)
 app.include_router(chat.router)
-app.include_router(conversations.router)
\ No newline at end of file
+app.include_router(conversations.router)
+app.include_router(metrics.router)
\ No newline at end of file
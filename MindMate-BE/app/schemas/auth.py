@@ -1,4 +1,7 @@
 from pydantic import BaseModel, EmailStr, validator
+from datetime import datetime
+from uuid import UUID
+from typing import Optional
 import re
 
 PASSWORD_REGEX = (
@@ -24,4 +27,14 @@ class ResetPasswordRequest(BaseModel):
         return value
 
 class ForgotPasswordRequest(BaseModel):
-    email: EmailStr
\ No newline at end of file
+    email: EmailStr
+
+
+class SessionOut(BaseModel):
+    family_id: UUID
+    device: Optional[str] = None
+    created_at: datetime
+    expires_at: datetime
+
+    class Config:
+        orm_mode = True
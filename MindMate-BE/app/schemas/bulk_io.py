@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import List
+
+class ImportRowError(BaseModel):
+    line: int  # 1-based line of the upload (first line of a multi-line CSV record)
+    error: str
+
+class ImportSummary(BaseModel):
+    imported: int
+    failed: int
+    errors: List[ImportRowError]  # first IMPORT_MAX_REPORTED_ERRORS rejected rows
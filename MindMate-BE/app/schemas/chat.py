@@ -1,6 +1,7 @@
 from pydantic import BaseModel
-from typing import List
+from typing import Optional
 from uuid import UUID
+from datetime import datetime
 
 class ConversationCreate(BaseModel):
     title: str = "New Chat"
@@ -8,9 +9,21 @@ class ConversationCreate(BaseModel):
 class ConversationOut(BaseModel):
     id: UUID
     title: str
+    updated_at: Optional[datetime] = None
+    summary_updated_at: Optional[datetime] = None
     class Config:
         orm_mode = True
 
+class SummaryStatus(BaseModel):
+    conversation_id: UUID
+    summary: Optional[str]
+    summary_updated_at: Optional[datetime]
+    summarized_until: Optional[datetime]
+    last_message_at: Optional[datetime]
+    messages_since_summary: int
+    stale_seconds: float
+    refresh_pending: bool
+
 class MessageOut(BaseModel):
     sender: str
     text: str
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, UUID4, Field
+from pydantic import BaseModel, UUID4, Field, validator
 from typing import List, Optional
 from datetime import datetime
 
@@ -11,6 +11,16 @@ class JournalEntryBase(BaseModel):
 class JournalEntryCreate(JournalEntryBase):
     pass
 
+class JournalEntryImport(JournalEntryCreate):
+    created_at: Optional[datetime] = None  # defaults to the import time
+
+    @validator("tags", pre=True)
+    def split_csv_tags(cls, v):
+        # CSV imports carry tags as one "a;b;c" cell
+        if isinstance(v, str):
+            return [tag.strip() for tag in v.split(";") if tag.strip()]
+        return v
+
 class JournalEntryUpdate(BaseModel):
     title: Optional[str]
     description: Optional[str]
@@ -23,3 +33,15 @@ class JournalEntryResponse(JournalEntryBase):
 
     class Config:
         orm_mode = True
+
+
+class JournalSearchHit(JournalEntryResponse):
+    rank: Optional[float] = None
+    snippet: Optional[str] = None  # matched terms wrapped in **
+
+class JournalSearchResponse(BaseModel):
+    results: List[JournalSearchHit]
+    next_offset: Optional[int] = None
+
+class JournalRelatedEntry(JournalEntryResponse):
+    score: float  # cosine similarity, 0..1
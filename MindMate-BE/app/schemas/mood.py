@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
-from typing import Optional
-from datetime import datetime
+from typing import Optional, List, Dict
+from datetime import datetime, date
 from uuid import UUID
 
 class MoodLogCreate(BaseModel):
@@ -9,6 +9,9 @@ class MoodLogCreate(BaseModel):
 class MoodLogUpdate(BaseModel):
     mood: Optional[int] = Field(None, ge=1, le=5)
 
+class MoodLogImport(MoodLogCreate):
+    created_at: Optional[datetime] = None  # defaults to the import time
+
 class MoodLogResponse(BaseModel):
     id: UUID
     mood: int
@@ -16,3 +19,25 @@ class MoodLogResponse(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class MoodStatsPoint(BaseModel):
+    start: date  # first day of the day/week/month bucket
+    average: Optional[float]
+    count: int
+
+class MoodStreaks(BaseModel):
+    current: int
+    longest: int
+    last_logged_on: Optional[date]
+
+class MoodStats(BaseModel):
+    from_date: date
+    to_date: date
+    total_logs: int
+    average: Optional[float]
+    distribution: Dict[int, int]
+    daily: List[MoodStatsPoint]
+    weekly: List[MoodStatsPoint]
+    monthly: List[MoodStatsPoint]
+    streaks: MoodStreaks
@@ -1,22 +1,23 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db import models
 from app.schemas.user import UserCreate
-from app.core.security import hash_password, verify_password, create_access_token
+from app.core.security import hash_password_async, verify_and_update_password
+from app.services.mail_service import send_verification_email
 from datetime import timedelta,datetime
 from app.core.config import settings
-from app.core.security import create_refresh_token
 from jose import jwt
 from fastapi import HTTPException
 from sqlalchemy.exc import IntegrityError
 
-def register_user(db: Session, user: UserCreate):
+async def register_user(db: AsyncSession, user: UserCreate):
     # ✅ Check if the user already exists
-    existing_user = db.query(models.User).filter(models.User.email == user.email).first()
+    existing_user = await db.scalar(select(models.User).where(models.User.email == user.email))
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    # ✅ Hash password if provided
-    hashed_pw = hash_password(user.password) if user.password else None
+    # ✅ Hash password if provided (bcrypt is CPU-bound, keep it off the event loop)
+    hashed_pw = await hash_password_async(user.password) if user.password else None
 
     # ✅ Create new user
     db_user = models.User(
@@ -31,33 +32,37 @@ def register_user(db: Session, user: UserCreate):
 
     try:
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.flush()  # a duplicate email fails here, before any mail is queued
+
+        # ✅ Queue the verification email before committing: if the outbox is full (503)
+        # nothing is saved, so a retry signs up cleanly instead of "Email already registered"
+        send_verification_email(db_user.email, create_email_verification_token(db_user.email))
+
+        await db.commit()
+        await db.refresh(db_user)
         return db_user
 
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail="Email already registered")
-def generate_tokens(user):
-    access_token = create_access_token(
-        {"sub": user.email},
-        expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    )
-    refresh_token = create_refresh_token(
-        {"sub": user.email}
-    )
-    return access_token, refresh_token
-
-def save_refresh_token(db: Session, user, refresh_token):
-    user.refresh_token = refresh_token
-    db.commit()
+    except HTTPException:
+        await db.rollback()
+        raise
 
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    user = await db.scalar(select(models.User).where(models.User.email == email))
+    if not user or not user.hashed_password:
+        return None
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if not user or not verify_password(password, user.hashed_password):
+    valid, new_hash = await verify_and_update_password(password, user.hashed_password)
+    if not valid:
         return None
 
+    # ✅ Stored hash used an old cost factor; upgrade it while we have the plaintext
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+
     if not user.is_verified:
         raise HTTPException(status_code=403, detail="Please verify your email first")
 
@@ -0,0 +1,199 @@
+import codecs
+import csv
+import io
+import json
+import logging
+import uuid
+from datetime import datetime, timezone
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import insert
+from app.core.config import settings
+from app.db.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+FORMAT_PATTERN = "^(ndjson|csv)$"
+
+_stats = {"imports": 0, "rows_imported": 0, "rows_rejected": 0, "batches": 0, "exports": 0, "rows_exported": 0}
+
+
+def upload_format(request: Request, fmt: str | None) -> str:
+    """Explicit `format` query param wins, otherwise the upload's Content-Type."""
+    if fmt:
+        return fmt
+    return "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+
+
+async def _lines(request: Request):
+    """Decoded lines of the request body as it arrives, never the whole upload at once."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def _ndjson_records(request: Request):
+    line_no = 0
+    async for line in _lines(request):
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("expected a JSON object")
+        except ValueError as e:
+            yield line_no, None, f"invalid JSON: {e}"
+            continue
+        yield line_no, record, None
+
+
+async def _csv_records(request: Request):
+    header = None
+    buffered, start_line, line_no = [], 0, 0
+    async for line in _lines(request):
+        line_no += 1
+        if not buffered:
+            start_line = line_no
+        buffered.append(line)
+        # ✅ A quoted field may span lines; the record is complete once quotes balance
+        record_text = "\n".join(buffered)
+        if record_text.count('"') % 2:
+            continue
+        buffered = []
+
+        if not record_text.strip():
+            continue
+        values = next(csv.reader([record_text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield start_line, None, f"expected {len(header)} columns, got {len(values)}"
+            continue
+        # Empty CSV cells mean "not provided"
+        yield start_line, {k: (v if v != "" else None) for k, v in zip(header, values)}, None
+
+    if buffered:
+        yield start_line, None, "unterminated quoted field"
+
+
+def _utc_naive(value: datetime | None) -> datetime:
+    if value is None:
+        return datetime.utcnow()
+    if value.tzinfo:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in error.errors())
+
+
+async def import_rows(request: Request, fmt: str, schema, user_id, model, to_row, after_batch=None):
+    """
+    Streams an NDJSON/CSV upload through `schema`, inserting valid rows into
+    `model` in multi-row batches of IMPORT_BATCH_SIZE, one transaction each.
+    Bad rows are skipped and reported by line number.
+    """
+    records = _csv_records(request) if fmt == "csv" else _ndjson_records(request)
+    summary = {"imported": 0, "failed": 0, "errors": []}
+
+    def reject(line_no, message):
+        summary["failed"] += 1
+        if len(summary["errors"]) < settings.IMPORT_MAX_REPORTED_ERRORS:
+            summary["errors"].append({"line": line_no, "error": message})
+
+    async with SessionLocal() as db:
+        batch = []
+
+        async def flush():
+            await db.execute(insert(model), batch)
+            if after_batch:
+                await after_batch(db, batch)
+            await db.commit()
+            _stats["batches"] += 1
+            summary["imported"] += len(batch)
+            batch.clear()
+
+        async for line_no, record, error in records:
+            if summary["imported"] + len(batch) >= settings.IMPORT_MAX_ROWS:
+                reject(line_no, f"import is limited to {settings.IMPORT_MAX_ROWS} rows")
+                break
+            if error:
+                reject(line_no, error)
+                continue
+            try:
+                item = schema(**record)
+            except ValidationError as e:
+                reject(line_no, _describe(e))
+                continue
+
+            row = to_row(item)
+            row.update(id=uuid.uuid4(), user_id=user_id, created_at=_utc_naive(item.created_at))
+            batch.append(row)
+            if len(batch) >= settings.IMPORT_BATCH_SIZE:
+                await flush()
+
+        if batch:
+            await flush()
+
+    _stats["imports"] += 1
+    _stats["rows_imported"] += summary["imported"]
+    _stats["rows_rejected"] += summary["failed"]
+    logger.info("Bulk import into %s: %s rows, %s rejected", model.__tablename__, summary["imported"], summary["failed"])
+    return summary
+
+
+def _csv_line(values) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+def _jsonable(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def export_response(stmt, columns: list[str], fmt: str, filename: str, csv_values=None) -> StreamingResponse:
+    """
+    Streams `stmt` through a server-side cursor (yield_per) as NDJSON or CSV.
+    The request's session is closed before the body streams, so this opens its own.
+    """
+    async def body():
+        async with SessionLocal() as db:
+            result = await db.stream_scalars(stmt.execution_options(yield_per=settings.EXPORT_FETCH_SIZE))
+            if fmt == "csv":
+                yield _csv_line(columns)
+            _stats["exports"] += 1
+            async for obj in result:
+                _stats["rows_exported"] += 1
+                values = {column: _jsonable(getattr(obj, column)) for column in columns}
+                if fmt == "csv":
+                    yield _csv_line([csv_values(column, value) if csv_values else value for column, value in values.items()])
+                else:
+                    yield json.dumps(values) + "\n"
+
+    return StreamingResponse(
+        body(),
+        media_type=FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'}
+    )
+
+
+
+def get_stats():
+    return {**_stats}
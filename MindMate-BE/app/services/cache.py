@@ -0,0 +1,74 @@
+import json
+from cachetools import TLRUCache
+from app.core.config import settings
+
+_redis = None
+
+
+def get_redis():
+    """Shared redis.asyncio client, created on first use."""
+    global _redis
+    if _redis is None:
+        import redis.asyncio as redis
+        _redis = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis
+
+
+class MemoryTTLStore:
+    """Process-local key/value store with a TTL per entry."""
+
+    def __init__(self, maxsize: int = 10000):
+        # ✅ Each value carries its own TTL so one store can mix lifetimes
+        self._data = TLRUCache(maxsize=maxsize, ttu=lambda _key, value, now: now + value[0])
+
+    async def get(self, key: str):
+        entry = self._data.get(key)
+        return entry[1] if entry else None
+
+    async def set(self, key: str, value, ttl: float):
+        self._data[key] = (ttl, value)
+
+    async def add(self, key: str, value, ttl: float) -> bool:
+        """Set only if absent; returns whether it was set."""
+        if self._data.get(key) is not None:
+            return False
+        self._data[key] = (ttl, value)
+        return True
+
+    async def delete(self, key: str):
+        self._data.pop(key, None)
+
+
+class RedisTTLStore:
+    """Same interface as MemoryTTLStore, shared across replicas through Redis."""
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+
+    def _key(self, key: str) -> str:
+        return f"mindmate:{self.namespace}:{key}"
+
+    async def get(self, key: str):
+        raw = await get_redis().get(self._key(key))
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value, ttl: float):
+        await get_redis().set(self._key(key), json.dumps(value), px=int(ttl * 1000))
+
+    async def add(self, key: str, value, ttl: float) -> bool:
+        return bool(await get_redis().set(self._key(key), json.dumps(value), px=int(ttl * 1000), nx=True))
+
+    async def delete(self, key: str):
+        await get_redis().delete(self._key(key))
+
+
+def make_store(namespace: str, maxsize: int = 10000):
+    """Pick the configured backend; values must be JSON-serialisable either way."""
+    if settings.CACHE_BACKEND == "redis":
+        return RedisTTLStore(namespace)
+    return MemoryTTLStore(maxsize=maxsize)
+
+
+async def close_redis():
+    if _redis is not None:
+        await _redis.aclose()
@@ -0,0 +1,68 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException, status
+from app.core.config import settings
+from app.db import models
+from app.services.encryption import encrypt_message, decrypt_stored_message, message_cache
+
+
+async def get_owned_conversation(db: AsyncSession, conversation_id, user) -> models.Conversation:
+    # 🔐 Check if conversation exists
+    convo = await db.get(models.Conversation, conversation_id)
+    if not convo:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conversation not found"
+        )
+
+    # 🔐 Check if conversation belongs to current user
+    if convo.user_id != user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You are not authorized to access this conversation"
+        )
+    return convo
+
+
+async def save_message(db: AsyncSession, conversation_id, sender: str, text: str) -> models.Message:
+    msg = models.Message(
+        id=uuid.uuid4(),
+        conversation_id=conversation_id,
+        sender=sender,
+        encrypted_text=encrypt_message(text)
+    )
+    msg_id = msg.id
+    db.add(msg)
+
+    # ✅ Track last activity so summary staleness can be measured against it
+    await db.execute(
+        update(models.Conversation)
+        .where(models.Conversation.id == conversation_id)
+        .values(updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+    # ✅ We already have the plaintext, so later reads skip the decrypt
+    message_cache.put(msg_id, conversation_id, text)
+    return msg
+
+
+async def load_context(db: AsyncSession, conversation_id, limit: int = settings.CHAT_CONTEXT_WINDOW):
+    # ✅ Only the tail window, newest first via ix_messages_conversation_created
+    recent_msgs = (await db.scalars(
+        select(models.Message)
+        .where(models.Message.conversation_id == conversation_id)
+        .order_by(models.Message.created_at.desc())
+        .limit(limit)
+    )).all()
+    recent_msgs.reverse()
+    return [
+        {
+            "sender": "assistant" if m.sender in ("assistant", "bot") else "user",
+            "text": decrypt_stored_message(m)
+        }
+        for m in recent_msgs
+    ]
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from fastapi import HTTPException
+from app.core.config import settings
+from app.services.cache import get_redis
+
+logger = logging.getLogger(__name__)
+
+_stats = {
+    "acquired": 0,
+    "contended": 0,
+    "timeouts": 0,
+    "held": 0,
+    "total_wait_ms": 0.0,
+    "max_wait_ms": 0.0,
+}
+
+
+class LocalConversationLocks:
+    """One FIFO asyncio.Lock per conversation, dropped once nobody holds or waits on it."""
+
+    def __init__(self):
+        self._locks: dict = {}
+
+    async def acquire(self, conversation_id, timeout: float):
+        entry = self._locks.setdefault(conversation_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            await asyncio.wait_for(entry[0].acquire(), timeout)
+        except asyncio.TimeoutError:
+            self._forget(conversation_id, entry)
+            raise
+
+        async def release():
+            entry[0].release()
+            self._forget(conversation_id, entry)
+        return release
+
+    def _forget(self, conversation_id, entry):
+        entry[1] -= 1
+        if entry[1] == 0:
+            self._locks.pop(conversation_id, None)
+
+
+class RedisConversationLocks:
+    """Same interface, shared by every replica; the TTL frees locks held by a crashed worker."""
+
+    async def acquire(self, conversation_id, timeout: float):
+        lock = get_redis().lock(
+            f"mindmate:conversation-lock:{conversation_id}",
+            timeout=settings.CHAT_SEND_LOCK_TTL_SECONDS,
+            blocking_timeout=timeout,
+        )
+        if not await lock.acquire():
+            raise asyncio.TimeoutError()
+
+        async def release():
+            try:
+                await lock.release()
+            except Exception:
+                logger.warning("Conversation lock for %s expired before release", conversation_id)
+        return release
+
+
+class ConversationLocks:
+    """
+    Serializes chat sends per conversation so each one sees the previous
+    exchange in its context. Redis-backed when CACHE_BACKEND=redis.
+    """
+
+    def __init__(self):
+        self._backend = RedisConversationLocks() if settings.CACHE_BACKEND == "redis" else LocalConversationLocks()
+
+    async def acquire(self, conversation_id):
+        """Wait for our turn; returns an async `release()`. Raises 409 if the wait runs too long."""
+        started = time.perf_counter()
+        try:
+            release = await self._backend.acquire(conversation_id, settings.CHAT_SEND_LOCK_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            _stats["timeouts"] += 1
+            raise HTTPException(status_code=409, detail="Still replying to your previous message, please try again")
+
+        waited_ms = (time.perf_counter() - started) * 1000
+        _stats["acquired"] += 1
+        _stats["held"] += 1
+        _stats["total_wait_ms"] += waited_ms
+        _stats["max_wait_ms"] = max(_stats["max_wait_ms"], waited_ms)
+        if waited_ms > 1:
+            _stats["contended"] += 1
+
+        async def release_once():
+            nonlocal release
+            if release is not None:
+                _stats["held"] -= 1
+                await release()
+                release = None
+        return release_once
+
+    @asynccontextmanager
+    async def hold(self, conversation_id):
+        release = await self.acquire(conversation_id)
+        try:
+            yield
+        finally:
+            await release()
+
+
+conversation_locks = ConversationLocks()
+
+
+def get_stats():
+    acquired = _stats["acquired"]
+    return {
+        **_stats,
+        "backend": settings.CACHE_BACKEND,
+        "avg_wait_ms": round(_stats["total_wait_ms"] / acquired, 3) if acquired else 0.0,
+    }
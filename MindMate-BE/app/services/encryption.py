@@ -1,3 +1,6 @@
+import sys
+import threading
+from collections import OrderedDict
 from cryptography.fernet import Fernet
 from app.core.config import settings
 
@@ -9,3 +12,87 @@ def encrypt_message(plaintext: str) -> str:
 
 def decrypt_message(ciphertext: str) -> str:
     return cipher.decrypt(ciphertext.encode()).decode()
+
+
+class DecryptedMessageCache:
+    """
+    Process-local LRU of decrypted message text keyed by message id,
+    capped by the approximate memory held by the cached strings.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # message_id -> (conversation_id, text, size)
+        self._by_conversation = {}     # conversation_id -> set of message ids
+        self._lock = threading.Lock()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, message_id):
+        with self._lock:
+            entry = self._entries.get(message_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(message_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, message_id, conversation_id, text: str):
+        size = sys.getsizeof(text)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if message_id in self._entries:
+                self._remove(message_id)
+            self._entries[message_id] = (conversation_id, text, size)
+            self._by_conversation.setdefault(conversation_id, set()).add(message_id)
+            self._size += size
+
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def evict_conversation(self, conversation_id):
+        with self._lock:
+            for message_id in self._by_conversation.pop(conversation_id, ()):
+                entry = self._entries.pop(message_id, None)
+                if entry:
+                    self._size -= entry[2]
+
+    def _remove(self, message_id):
+        conversation_id, _, size = self._entries.pop(message_id)
+        self._size -= size
+        ids = self._by_conversation.get(conversation_id)
+        if ids is not None:
+            ids.discard(message_id)
+            if not ids:
+                del self._by_conversation[conversation_id]
+
+    def get_stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+message_cache = DecryptedMessageCache(settings.DECRYPTED_CACHE_MAX_BYTES)
+
+
+def decrypt_stored_message(msg) -> str:
+    """Decrypt a `Message` row, reusing the cached plaintext when we have it."""
+    text = message_cache.get(msg.id)
+    if text is None:
+        text = decrypt_message(msg.encrypted_text)
+        message_cache.put(msg.id, msg.conversation_id, text)
+    return text
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import re
+import time
+import httpx
+from fastapi import HTTPException
+from jose import jwt, JWTError
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
+GOOGLE_USERINFO_URL = "https://www.googleapis.com/oauth2/v1/userinfo"
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v3/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+# ✅ One keep-alive pool for every call to Google, so logins reuse TLS sessions
+http_client = httpx.AsyncClient(
+    limits=httpx.Limits(
+        max_connections=settings.GOOGLE_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.GOOGLE_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    ),
+    timeout=httpx.Timeout(
+        settings.GOOGLE_HTTP_TIMEOUT_SECONDS,
+        connect=settings.GOOGLE_HTTP_CONNECT_TIMEOUT_SECONDS,
+    ),
+)
+
+_certs = {"keys": {}, "expires_at": 0.0}
+_certs_lock = asyncio.Lock()
+
+_stats = {
+    "token_exchanges": 0,
+    "userinfo_calls": 0,
+    "id_tokens_verified": 0,
+    "id_token_failures": 0,
+    "cert_fetches": 0,
+    "errors": 0,
+    "total_latency_ms": 0.0,
+    "requests": 0,
+}
+
+
+async def _request(method: str, url: str, **kwargs) -> dict:
+    started = time.perf_counter()
+    try:
+        response = await http_client.request(method, url, **kwargs)
+    except httpx.HTTPError:
+        _stats["errors"] += 1
+        logger.exception("Request to Google failed: %s", url)
+        raise HTTPException(status_code=502, detail="Could not reach Google, please try again")
+    finally:
+        _stats["requests"] += 1
+        _stats["total_latency_ms"] += (time.perf_counter() - started) * 1000
+
+    # Google reports OAuth errors in the JSON body; callers check for missing fields
+    try:
+        return response.json()
+    except ValueError:
+        _stats["errors"] += 1
+        raise HTTPException(status_code=502, detail="Unexpected response from Google")
+
+
+async def exchange_code(code: str) -> dict:
+    """Trade an authorization code for Google's access/ID tokens."""
+    _stats["token_exchanges"] += 1
+    return await _request("POST", GOOGLE_TOKEN_URL, data={
+        "code": code,
+        "client_id": settings.GOOGLE_CLIENT_ID,
+        "client_secret": settings.GOOGLE_CLIENT_SECRET,
+        "redirect_uri": settings.GOOGLE_REDIRECT_URI,
+        "grant_type": "authorization_code"
+    })
+
+
+async def fetch_userinfo(access_token: str) -> dict:
+    _stats["userinfo_calls"] += 1
+    return await _request("GET", GOOGLE_USERINFO_URL, params={"access_token": access_token})
+
+
+def _max_age(cache_control: str) -> float:
+    match = re.search(r"max-age=(\d+)", cache_control or "")
+    return float(match.group(1)) if match else settings.GOOGLE_CERTS_DEFAULT_TTL_SECONDS
+
+
+async def _get_signing_key(kid: str):
+    """Google's public key for `kid`, refetching the JWKS when expired or on key rotation."""
+    if kid in _certs["keys"] and _certs["expires_at"] > time.monotonic():
+        return _certs["keys"][kid]
+
+    async with _certs_lock:
+        # Another request may have refreshed the set while we waited
+        if kid not in _certs["keys"] or _certs["expires_at"] <= time.monotonic():
+            started = time.perf_counter()
+            try:
+                response = await http_client.get(GOOGLE_CERTS_URL)
+                response.raise_for_status()
+                keys = {key["kid"]: key for key in response.json()["keys"]}
+            except (httpx.HTTPError, ValueError, KeyError):
+                _stats["errors"] += 1
+                logger.exception("Fetching Google signing certs failed")
+                return _certs["keys"].get(kid)
+            finally:
+                _stats["requests"] += 1
+                _stats["total_latency_ms"] += (time.perf_counter() - started) * 1000
+
+            _stats["cert_fetches"] += 1
+            _certs["keys"] = keys
+            _certs["expires_at"] = time.monotonic() + _max_age(response.headers.get("cache-control"))
+
+    return _certs["keys"].get(kid)
+
+
+async def verify_id_token(id_token: str, access_token: str | None = None) -> dict | None:
+    """Claims of a valid Google ID token issued to this app, or None if it doesn't check out."""
+    try:
+        kid = jwt.get_unverified_header(id_token).get("kid")
+        key = await _get_signing_key(kid) if kid else None
+        if key is None:
+            raise JWTError("Unknown signing key")
+
+        claims = jwt.decode(
+            id_token,
+            key,
+            algorithms=["RS256"],
+            audience=settings.GOOGLE_CLIENT_ID,
+            issuer=GOOGLE_ISSUERS,
+            access_token=access_token,
+            options={"verify_at_hash": access_token is not None},
+        )
+    except JWTError:
+        _stats["id_token_failures"] += 1
+        logger.warning("Google ID token failed verification", exc_info=True)
+        return None
+
+    _stats["id_tokens_verified"] += 1
+    return claims
+
+
+async def get_google_profile(access_token: str, id_token: str | None = None) -> dict:
+    """
+    Email and names for the Google account. A verified ID token already carries
+    them, so the userinfo call is only made when there isn't one.
+    """
+    claims = await verify_id_token(id_token, access_token) if id_token else None
+    if claims and claims.get("email_verified"):
+        return claims
+    return await fetch_userinfo(access_token)
+
+
+def get_stats():
+    requests = _stats["requests"]
+    return {
+        **_stats,
+        "cached_certs": len(_certs["keys"]),
+        "certs_ttl_seconds": round(max(_certs["expires_at"] - time.monotonic(), 0.0), 1),
+        "avg_latency_ms": round(_stats["total_latency_ms"] / requests, 3) if requests else 0.0,
+    }
+
+
+async def close_client():
+    await http_client.aclose()
@@ -1,16 +1,111 @@
-import os
-from openai import OpenAI
+import asyncio
+import time
+from contextlib import asynccontextmanager
+import httpx
+from openai import AsyncOpenAI
 from app.core.config import settings
+from app.services.token_counter import count_message_tokens, TOKENS_PER_REPLY
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+# ✅ One pooled keep-alive connection pool shared by every LLM call in this process
+http_client = httpx.AsyncClient(
+    limits=httpx.Limits(
+        max_connections=settings.OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+    ),
+    timeout=httpx.Timeout(
+        settings.OPENAI_TIMEOUT_SECONDS,
+        connect=settings.OPENAI_CONNECT_TIMEOUT_SECONDS,
+    ),
+)
 
-SYSTEM_PROMPT = """You are MindMate, a mental wellness chatbot.
+client = AsyncOpenAI(
+    api_key=settings.OPENAI_API_KEY,
+    http_client=http_client,
+    max_retries=settings.OPENAI_MAX_RETRIES,
+)
+
+# ✅ Caps how many completions this process has in flight at once
+_llm_slots = asyncio.Semaphore(settings.OPENAI_MAX_CONCURRENCY)
+
+_stats = {
+    "calls": 0,
+    "errors": 0,
+    "in_flight": 0,
+    "waiting": 0,
+    "total_latency_ms": 0.0,
+    "usage_prompt_tokens": 0,
+    "usage_completion_tokens": 0,
+}
+
+# ✅ Locally counted reply prompts, before they're sent
+_prompt_stats = {
+    "prompts": 0,
+    "total_tokens": 0,
+    "max_tokens": 0,
+    "last_tokens": 0,
+    "turns_included": 0,
+    "turns_dropped": 0,
+}
+
+# ✅ Also sent directly (no model call) when the local classifier flags a message as off topic
+OFF_TOPIC_REPLY = "I'm here for mental wellness. Let's focus on how you're feeling."
+
+SYSTEM_PROMPT = f"""You are MindMate, a mental wellness chatbot.
 ✅ Help with emotional support, CBT-style reflection, stress management.
 ❌ Do NOT solve math, programming, or technical questions.
 If asked unrelated queries, politely say:
-"I'm here for mental wellness. Let's focus on how you're feeling." """
+"{OFF_TOPIC_REPLY}" """
 
-async def get_mental_health_reply(context_messages, new_message, summary=None):
+
+@asynccontextmanager
+async def _llm_slot():
+    """Holds one of the OPENAI_MAX_CONCURRENCY slots, counting callers queued for one."""
+    _stats["waiting"] += 1
+    try:
+        await _llm_slots.acquire()
+    finally:
+        # ✅ Also when the wait is cancelled (client gone, request timeout)
+        _stats["waiting"] -= 1
+    try:
+        yield
+    finally:
+        _llm_slots.release()
+
+
+async def _complete(messages):
+    """Run one chat completion inside the concurrency limit and record timings."""
+    async with _llm_slot():
+        _stats["in_flight"] += 1
+        started = time.perf_counter()
+        try:
+            completion = await client.chat.completions.create(
+                model=settings.OPENAI_MODEL,
+                messages=messages
+            )
+        except Exception:
+            _stats["errors"] += 1
+            raise
+        finally:
+            _stats["in_flight"] -= 1
+            _stats["calls"] += 1
+            _stats["total_latency_ms"] += (time.perf_counter() - started) * 1000
+
+    _record_usage(completion.usage)
+    return completion.choices[0].message.content
+
+
+def _record_usage(usage):
+    if usage:
+        _stats["usage_prompt_tokens"] += usage.prompt_tokens
+        _stats["usage_completion_tokens"] += usage.completion_tokens
+
+
+def build_reply_prompt(context_messages, new_message, summary=None, token_budget=None):
+    """
+    System prompt, summary and the new message always go in; then as many of
+    the most recent turns as fit in `token_budget` (CHAT_CONTEXT_TOKEN_BUDGET).
+    """
+    token_budget = token_budget or settings.CHAT_CONTEXT_TOKEN_BUDGET
     messages = [
         {"role": "system", "content": SYSTEM_PROMPT},
     ]
@@ -22,40 +117,118 @@ async def get_mental_health_reply(context_messages, new_message, summary=None):
             "content": f"Here’s what you already know about the user: {summary}"
         })
 
-    # ✅ Add last 10 messages for short-term context
-    for msg in context_messages[-10:]:
-        messages.append({"role": msg["sender"], "content": msg["text"]})
+    new_msg = {"role": "user", "content": new_message}
+    used = TOKENS_PER_REPLY + count_message_tokens(new_msg) + sum(count_message_tokens(m) for m in messages)
 
-    # ✅ Add new message
-    messages.append({"role": "user", "content": new_message})
+    # ✅ Walk back from the newest turn and stop at the first one that doesn't fit,
+    # so the model never sees a gap in the recent conversation
+    history = []
+    for msg in reversed(context_messages):
+        turn = {"role": msg["sender"], "content": msg["text"]}
+        cost = count_message_tokens(turn)
+        if used + cost > token_budget:
+            break
+        history.append(turn)
+        used += cost
 
-    completion = client.chat.completions.create(
-        model="gpt-4o",
-        messages=messages
-    )
+    messages.extend(reversed(history))
+    messages.append(new_msg)
+
+    _prompt_stats["prompts"] += 1
+    _prompt_stats["total_tokens"] += used
+    _prompt_stats["max_tokens"] = max(_prompt_stats["max_tokens"], used)
+    _prompt_stats["last_tokens"] = used
+    _prompt_stats["turns_included"] += len(history)
+    _prompt_stats["turns_dropped"] += len(context_messages) - len(history)
+    return messages
+
+
+async def get_mental_health_reply(context_messages, new_message, summary=None):
+    return await _complete(build_reply_prompt(context_messages, new_message, summary))
 
-    return completion.choices[0].message.content
 
-async def summarize_conversation(all_messages):
+async def stream_mental_health_reply(context_messages, new_message, summary=None):
+    """Yield reply text deltas as gpt-4o produces them."""
+    messages = build_reply_prompt(context_messages, new_message, summary)
+
+    async with _llm_slot():
+        _stats["in_flight"] += 1
+        started = time.perf_counter()
+        try:
+            stream = await client.chat.completions.create(
+                model=settings.OPENAI_MODEL,
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            # ✅ Closing the stream drops the upstream HTTP response if we stop early
+            async with stream:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+                    # ✅ The final chunk carries usage and no choices
+                    _record_usage(chunk.usage)
+        except Exception:
+            _stats["errors"] += 1
+            raise
+        finally:
+            _stats["in_flight"] -= 1
+            _stats["calls"] += 1
+            _stats["total_latency_ms"] += (time.perf_counter() - started) * 1000
+
+async def summarize_conversation(all_messages, previous_summary=None):
     """
-    Takes all messages (plaintext) and returns a 2-3 sentence summary.
+    Takes plaintext messages and returns a 2-3 sentence summary.
+    With `previous_summary`, only the new messages are sent and the model folds
+    them into the existing summary, so prompt size stays flat as chats grow.
     """
-    summary_prompt = [
-        {
-            "role": "system",
-            "content": "Summarize this conversation in 2-3 sentences focusing on user's feelings and key topics."
+    transcript = "\n".join(
+        [f"{m['sender']}: {m['text']}" for m in all_messages]
+    )
+
+    if previous_summary:
+        summary_prompt = [
+            {
+                "role": "system",
+                "content": (
+                    "Update the running summary of a conversation with the new messages below. "
+                    "Keep it to 2-3 sentences focusing on user's feelings and key topics."
+                )
+            },
+            {
+                "role": "user",
+                "content": f"Current summary:\n{previous_summary}\n\nNew messages:\n{transcript}"
+            }
+        ]
+    else:
+        summary_prompt = [
+            {
+                "role": "system",
+                "content": "Summarize this conversation in 2-3 sentences focusing on user's feelings and key topics."
+            },
+            {
+                "role": "user",
+                "content": transcript
+            }
+        ]
+
+    return await _complete(summary_prompt)
+
+
+def get_stats():
+    calls = _stats["calls"]
+    prompts = _prompt_stats["prompts"]
+    return {
+        **_stats,
+        "max_concurrency": settings.OPENAI_MAX_CONCURRENCY,
+        "avg_latency_ms": round(_stats["total_latency_ms"] / calls, 2) if calls else 0.0,
+        "reply_prompts": {
+            **_prompt_stats,
+            "token_budget": settings.CHAT_CONTEXT_TOKEN_BUDGET,
+            "avg_tokens": round(_prompt_stats["total_tokens"] / prompts, 1) if prompts else 0.0,
         },
-        {
-            "role": "user",
-            "content": "\n".join(
-                [f"{m['sender']}: {m['text']}" for m in all_messages]
-            )
-        }
-    ]
+    }
 
-    completion = client.chat.completions.create(
-        model="gpt-4o",
-        messages=summary_prompt
-    )
 
-    return completion.choices[0].message.content
+async def close_client():
+    await client.close()
@@ -0,0 +1,118 @@
+import asyncio
+import hashlib
+import logging
+from fastapi import HTTPException
+from app.core.config import settings
+from app.services.cache import make_store
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+_store = make_store("idempotency", maxsize=settings.IDEMPOTENCY_MAX_ENTRIES)
+# ✅ Wakes waiters in this process immediately; other replicas notice by polling
+_local_done: dict = {}
+_stats = {"executed": 0, "replayed": 0, "waited": 0, "conflicts": 0, "failed": 0}
+
+
+def request_fingerprint(*parts) -> str:
+    return hashlib.sha256("|".join(str(part) for part in parts).encode()).hexdigest()
+
+
+async def _wait_for_result(store_key: str):
+    _stats["waited"] += 1
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.IDEMPOTENCY_WAIT_SECONDS
+
+    while loop.time() < deadline:
+        event = _local_done.get(store_key)
+        try:
+            if event:
+                await asyncio.wait_for(event.wait(), settings.IDEMPOTENCY_POLL_SECONDS)
+            else:
+                await asyncio.sleep(settings.IDEMPOTENCY_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+        entry = await _store.get(store_key)
+        if entry is None:
+            # The original attempt failed and released the key
+            return None
+        if entry["state"] == "done":
+            return entry["result"]
+
+    raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+
+
+async def _keep_claim(store_key: str, fingerprint: str):
+    """
+    Re-arms the pending marker while the work runs. The marker's TTL only has to
+    outlive a dead process, not the slowest send (LLM retries, summary refresh).
+    """
+    ttl = settings.IDEMPOTENCY_PENDING_TTL_SECONDS
+    while True:
+        await asyncio.sleep(ttl / 3)
+        try:
+            await _store.set(store_key, {"state": "pending", "fingerprint": fingerprint}, ttl)
+        except Exception:
+            logger.exception("Failed to refresh idempotency claim %s", store_key)
+
+
+async def run_once(scope: str, key: str, fingerprint: str, work):
+    """
+    Runs `work()` once per (scope, key) within IDEMPOTENCY_TTL_SECONDS.
+    Repeats get the stored JSON result (or wait for the in-flight one).
+    Returns `(result, replayed)`; a failed attempt frees the key for a retry.
+    """
+    store_key = f"{scope}:{key}"
+
+    while True:
+        claimed = await _store.add(
+            store_key, {"state": "pending", "fingerprint": fingerprint}, settings.IDEMPOTENCY_PENDING_TTL_SECONDS
+        )
+        if claimed:
+            break
+
+        entry = await _store.get(store_key)
+        if entry is None:
+            continue  # expired between add and get; try to claim again
+        if entry["fingerprint"] != fingerprint:
+            _stats["conflicts"] += 1
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        if entry["state"] == "done":
+            _stats["replayed"] += 1
+            return entry["result"], True
+
+        result = await _wait_for_result(store_key)
+        if result is not None:
+            _stats["replayed"] += 1
+            return result, True
+
+    event = _local_done[store_key] = asyncio.Event()
+    heartbeat = asyncio.create_task(_keep_claim(store_key, fingerprint))
+    try:
+        try:
+            result = await work()
+        finally:
+            # ✅ Stopped before the result is stored (or the key freed), so a late refresh can't undo either
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+    except BaseException:
+        _stats["failed"] += 1
+        await _store.delete(store_key)
+        raise
+    else:
+        _stats["executed"] += 1
+        await _store.set(
+            store_key, {"state": "done", "fingerprint": fingerprint, "result": result}, settings.IDEMPOTENCY_TTL_SECONDS
+        )
+    finally:
+        # ✅ Only after the result is stored, so woken waiters find it
+        event.set()
+        _local_done.pop(store_key, None)
+    return result, False
+
+
+def get_stats():
+    return {**_stats, "in_flight": len(_local_done), "backend": settings.CACHE_BACKEND}
@@ -0,0 +1,55 @@
+from sqlalchemy import select, func, literal_column
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models import JournalEntry
+
+SEARCH_CONFIG = literal_column("'english'::regconfig")
+# Plain-text markers so snippets are safe to render without HTML escaping
+HEADLINE_OPTIONS = "StartSel=**, StopSel=**, MaxFragments=2, MaxWords=25, MinWords=8, FragmentDelimiter= … "
+
+
+async def search_entries(
+    db: AsyncSession,
+    user_id,
+    query: str | None,
+    tags: list[str] | None,
+    match_all_tags: bool,
+    limit: int,
+    offset: int,
+):
+    """
+    Ranked full-text search (ix_journal_entries_search) with optional tag
+    filtering (ix_journal_entries_tags). Returns `(hits, has_more)` where each
+    hit is `(entry, rank, snippet)`; without a query, newest entries come first.
+    """
+    stmt = select(JournalEntry).where(JournalEntry.user_id == user_id)
+
+    if tags:
+        # ✅ @> (all tags) and && (any tag) are both served by the GIN index
+        stmt = stmt.where(JournalEntry.tags.contains(tags) if match_all_tags else JournalEntry.tags.overlap(tags))
+
+    if not query:
+        rows = (await db.scalars(
+            stmt.order_by(JournalEntry.created_at.desc(), JournalEntry.id.desc()).offset(offset).limit(limit + 1)
+        )).all()
+        return [(entry, None, None) for entry in rows[:limit]], len(rows) > limit
+
+    ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+    rank = func.ts_rank_cd(JournalEntry.search_vector, ts_query)
+
+    # ✅ Rank and page first; ts_headline is costly, so only the returned rows get snippets
+    page = (
+        stmt.with_only_columns(JournalEntry.id, rank.label("rank"))
+        .where(JournalEntry.search_vector.op("@@")(ts_query))
+        .order_by(rank.desc(), JournalEntry.created_at.desc(), JournalEntry.id.desc())
+        .offset(offset)
+        .limit(limit + 1)
+        .subquery()
+    )
+    snippet = func.ts_headline(SEARCH_CONFIG, JournalEntry.description, ts_query, HEADLINE_OPTIONS)
+
+    rows = (await db.execute(
+        select(JournalEntry, page.c.rank, snippet)
+        .join(page, page.c.id == JournalEntry.id)
+        .order_by(page.c.rank.desc(), JournalEntry.created_at.desc(), JournalEntry.id.desc())
+    )).all()
+    return [(entry, rank_value, text) for entry, rank_value, text in rows[:limit]], len(rows) > limit
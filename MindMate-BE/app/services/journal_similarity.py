@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import math
+import re
+import zlib
+from collections import Counter
+import numpy as np
+from sqlalchemy import select, text, bindparam, LargeBinary
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models import JournalEntry
+
+logger = logging.getLogger(__name__)
+
+# Feature hashing into 2^16 buckets, so a term's index fits in uint16
+DIMENSIONS = 1 << 16
+TAG_WEIGHT = 2.0  # a shared tag says more than a shared word
+MIN_SCORE = 0.05
+# One stored term: (bucket, sublinear term frequency)
+TERM_DTYPE = np.dtype([("index", "<u2"), ("weight", "<f4")])
+
+_WORD = re.compile(r"[a-z][a-z0-9']+")
+STOPWORDS = frozenset("""
+a about after again all also am an and any are as at be because been before being but by can could did do does
+doing don down during each even ever every few for from further get got had has have having he her here hers him
+his how i if in into is it its it's just like me more most much my no nor not now of off on once only or other our
+out over own really same she should so some still such than that the their them then there these they this those
+through to too under until up us very was we were what when where which while who whom why will with would you
+your yours i'm i've i'd i'll
+""".split())
+
+# ✅ Many entries' vectors in one statement (also used by the 0010 backfill)
+STORE_VECTORS = text("""
+    UPDATE journal_entries SET similarity_vector = v.vector
+    FROM unnest(:ids, :vectors) AS v(id, vector)
+    WHERE journal_entries.id = v.id
+""").bindparams(
+    bindparam("ids", type_=ARRAY(UUID(as_uuid=True))),
+    bindparam("vectors", type_=ARRAY(LargeBinary)),
+)
+
+_stats = {"vectors_built": 0, "lazy_backfills": 0, "queries": 0, "candidates_scored": 0}
+
+
+def _bucket(term: str) -> int:
+    # crc32 rather than hash(): str hashes are salted per process
+    return zlib.crc32(term.encode()) % DIMENSIONS
+
+
+def build_vector(title: str, description: str, tags: list[str] | None) -> bytes:
+    """
+    Hashed term frequencies (1 + log tf) for one entry. IDF is applied at
+    query time over the user's own entries, so an entry's vector never has
+    to be rebuilt when other entries change.
+    """
+    words = [w for w in _WORD.findall(f"{title} {description}".lower()) if w not in STOPWORDS]
+    weights: dict = {}
+    for word, count in Counter(words).items():
+        bucket = _bucket(word)
+        weights[bucket] = weights.get(bucket, 0.0) + 1.0 + math.log(count)
+    for tag in {t.strip().lower() for t in tags or [] if t.strip()}:
+        bucket = _bucket(f"#{tag}")
+        weights[bucket] = weights.get(bucket, 0.0) + TAG_WEIGHT
+
+    _stats["vectors_built"] += 1
+    terms = np.array(sorted(weights.items()), dtype=TERM_DTYPE)
+    return terms.tobytes()
+
+
+def vector_for(entry) -> bytes:
+    return build_vector(entry.title, entry.description, entry.tags)
+
+
+async def _load_vectors(db: AsyncSession, user_id):
+    rows = (await db.execute(
+        select(JournalEntry.id, JournalEntry.similarity_vector).where(JournalEntry.user_id == user_id)
+    )).all()
+
+    missing = [row.id for row in rows if row.similarity_vector is None]
+    if not missing:
+        return [row.id for row in rows], [row.similarity_vector for row in rows]
+
+    # ✅ Entries the 0010 backfill didn't reach get theirs on first use, written back in one statement
+    entries = (await db.execute(
+        select(JournalEntry.id, JournalEntry.title, JournalEntry.description, JournalEntry.tags)
+        .where(JournalEntry.id.in_(missing))
+    )).all()
+    built = dict(zip(
+        [entry.id for entry in entries],
+        await asyncio.to_thread(lambda: [vector_for(entry) for entry in entries]),
+    ))
+    await db.execute(STORE_VECTORS, {"ids": list(built), "vectors": list(built.values())})
+    await db.commit()
+    _stats["lazy_backfills"] += len(built)
+    logger.info("Built similarity vectors for %s older journal entries", len(built))
+    return [row.id for row in rows], [row.similarity_vector or built[row.id] for row in rows]
+
+
+def _rank(ids: list, blobs: list[bytes], target_id, k: int):
+    """Cosine similarity of TF-IDF vectors, computed sparsely over all of the user's entries at once."""
+    terms = [np.frombuffer(blob, dtype=TERM_DTYPE) for blob in blobs]
+    lengths = np.fromiter((len(t) for t in terms), dtype=np.int64, count=len(terms))
+    flat = np.concatenate(terms) if terms else np.empty(0, dtype=TERM_DTYPE)
+    indices = flat["index"].astype(np.int64)
+    rows = np.repeat(np.arange(len(terms)), lengths)
+
+    # Buckets are unique within an entry, so bucket counts are document frequencies
+    df = np.bincount(indices, minlength=DIMENSIONS)
+    idf = np.log((1 + len(terms)) / (1 + df)) + 1.0
+    weights = flat["weight"] * idf[indices]
+    norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=len(terms)))
+
+    target = ids.index(target_id)
+    query = np.zeros(DIMENSIONS)
+    own = rows == target
+    query[indices[own]] = weights[own]
+    if not norms[target]:
+        return []
+
+    scores = np.bincount(rows, weights=weights * query[indices], minlength=len(terms))
+    scores = np.divide(scores, norms * norms[target], out=np.zeros_like(scores), where=norms > 0)
+    scores[target] = -1.0
+
+    k = min(k, len(terms) - 1)
+    if k <= 0:
+        return []
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return [(ids[i], float(scores[i])) for i in top if scores[i] >= MIN_SCORE]
+
+
+async def related_entries(db: AsyncSession, user_id, entry_id, k: int):
+    """Top-k most similar entries of the same user as `[(entry, score)]`, best first."""
+    ids, blobs = await _load_vectors(db, user_id)
+    if entry_id not in ids:
+        return None
+
+    _stats["queries"] += 1
+    _stats["candidates_scored"] += len(ids)
+    # ✅ Tens of ms for thousands of entries; keep it off the event loop
+    ranked = await asyncio.to_thread(_rank, ids, blobs, entry_id, k)
+    if not ranked:
+        return []
+
+    entries = {
+        entry.id: entry
+        for entry in (await db.scalars(select(JournalEntry).where(JournalEntry.id.in_([i for i, _ in ranked])))).all()
+    }
+    return [(entries[i], score) for i, score in ranked if i in entries]
+
+
+def get_stats():
+    return {**_stats, "dimensions": DIMENSIONS}
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import time
+from email.message import EmailMessage
+import aiosmtplib
+from fastapi import HTTPException
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _is_permanent(error: Exception) -> bool:
+    """
+    5xx replies (bad recipient, policy) won't succeed on retry; 4xx ones
+    (greylisting, mailbox busy, "451 try again later") usually do.
+    """
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return all(refused.code >= 500 for refused in error.recipients)
+    if isinstance(error, aiosmtplib.SMTPResponseException):
+        return error.code >= 500
+    return False
+
+
+def build_message(to: str, subject: str, html: str, text: str | None = None) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = settings.MAIL_FROM
+    message["To"] = to
+    message["Subject"] = subject
+    # ✅ Plain part first so clients that can't render HTML still get the link
+    message.set_content(text or "This message requires an HTML-capable mail client.")
+    message.add_alternative(html, subtype="html")
+    return message
+
+
+class MailOutbox:
+    """
+    In-process outbox: requests enqueue and return, one worker drains the queue
+    in batches over a single SMTP connection that stays open between batches.
+    """
+
+    def __init__(self):
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._smtp: aiosmtplib.SMTP | None = None
+        self._last_used = 0.0
+        self._retrying: set = set()
+        self._stats = {
+            "enqueued": 0,
+            "rejected": 0,
+            "sent": 0,
+            "failed": 0,
+            "retries": 0,
+            "connects": 0,
+            "batches": 0,
+            "total_send_ms": 0.0,
+            "max_send_ms": 0.0,
+            "dequeued": 0,
+            "total_queue_wait_ms": 0.0,
+            "worker_restarts": 0,
+        }
+
+    def start(self):
+        if self._worker is None:
+            self._queue = asyncio.Queue(maxsize=settings.MAIL_QUEUE_MAX_SIZE)
+            self._start_worker()
+
+    def _start_worker(self):
+        self._worker = asyncio.create_task(self._run())
+        self._worker.add_done_callback(self._on_worker_done)
+
+    def _on_worker_done(self, task: asyncio.Task):
+        # ✅ A dead worker would let mail pile up silently until the queue-full 503s; bring it back
+        if task is not self._worker or task.cancelled():
+            return
+        logger.error("Mail outbox worker stopped, restarting it", exc_info=task.exception())
+        self._stats["worker_restarts"] += 1
+        self._start_worker()
+
+    def enqueue(self, message: EmailMessage):
+        if self._queue is None:
+            self.start()
+        try:
+            # ✅ Attempt count travels with the message so retries can re-queue it
+            self._queue.put_nowait((message, time.perf_counter(), 0))
+        except asyncio.QueueFull:
+            self._stats["rejected"] += 1
+            raise HTTPException(status_code=503, detail="Mail service is busy, please try again shortly")
+        self._stats["enqueued"] += 1
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=settings.MAIL_SERVER,
+            port=settings.MAIL_PORT,
+            use_tls=settings.MAIL_SSL,
+            start_tls=settings.MAIL_TLS and not settings.MAIL_SSL,
+            timeout=settings.MAIL_TIMEOUT_SECONDS,
+        )
+        await smtp.connect()
+        if settings.MAIL_USERNAME:
+            await smtp.login(settings.MAIL_USERNAME, settings.MAIL_PASSWORD)
+        self._stats["connects"] += 1
+        return smtp
+
+    async def _get_connection(self) -> aiosmtplib.SMTP:
+        # ✅ Servers drop idle sessions; reconnect rather than fail the first send
+        idle = time.monotonic() - self._last_used
+        if self._smtp is not None and (not self._smtp.is_connected or idle > settings.MAIL_IDLE_TIMEOUT_SECONDS):
+            await self._disconnect()
+        if self._smtp is None:
+            self._smtp = await self._connect()
+        return self._smtp
+
+    async def _disconnect(self):
+        if self._smtp is None:
+            return
+        smtp, self._smtp = self._smtp, None
+        try:
+            if smtp.is_connected:
+                await smtp.quit()
+        except (aiosmtplib.SMTPException, OSError):
+            smtp.close()
+
+    async def _next_batch(self) -> list:
+        batch = [await self._queue.get()]
+        while len(batch) < settings.MAIL_BATCH_SIZE and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            self._stats["batches"] += 1
+            try:
+                for item in batch:
+                    try:
+                        await self._deliver(*item)
+                    except Exception:
+                        # ✅ Anything _deliver doesn't expect (e.g. a malformed message) costs that one mail only
+                        self._stats["failed"] += 1
+                        logger.exception("Dropping mail to %s after an unexpected error", item[0]["To"])
+                        await self._disconnect()
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _deliver(self, message: EmailMessage, enqueued_at: float, attempt: int):
+        started = time.perf_counter()
+        if attempt == 0:
+            self._stats["dequeued"] += 1
+            self._stats["total_queue_wait_ms"] += (started - enqueued_at) * 1000
+
+        try:
+            smtp = await self._get_connection()
+            await smtp.send_message(message)
+        except (aiosmtplib.SMTPException, OSError, asyncio.TimeoutError) as e:
+            if _is_permanent(e):
+                self._stats["failed"] += 1
+                logger.exception("Mail to %s rejected by server", message["To"])
+                return
+            await self._disconnect()
+            if attempt + 1 >= settings.MAIL_MAX_ATTEMPTS:
+                self._stats["failed"] += 1
+                logger.exception("Giving up on mail to %s after %s attempts", message["To"], attempt + 1)
+                return
+            self._stats["retries"] += 1
+            task = asyncio.create_task(self._retry_later(message, enqueued_at, attempt + 1))
+            self._retrying.add(task)
+            task.add_done_callback(self._retrying.discard)
+            return
+
+        self._last_used = time.monotonic()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._stats["sent"] += 1
+        self._stats["total_send_ms"] += elapsed_ms
+        self._stats["max_send_ms"] = max(self._stats["max_send_ms"], elapsed_ms)
+
+    async def _retry_later(self, message: EmailMessage, enqueued_at: float, attempt: int):
+        # ✅ Exponential backoff without holding up the rest of the queue
+        await asyncio.sleep(settings.MAIL_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+        try:
+            self._queue.put_nowait((message, enqueued_at, attempt))
+        except asyncio.QueueFull:
+            self._stats["failed"] += 1
+            logger.error("Dropping retry for mail to %s, outbox is full", message["To"])
+
+    async def shutdown(self):
+        if self._worker is None:
+            return
+        # ✅ Give queued mail a short window to go out before stopping
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=settings.MAIL_SHUTDOWN_GRACE_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning("Shutting down with %s unsent emails", self._queue.qsize())
+        self._worker.cancel()
+        self._worker = None
+        for task in self._retrying:
+            task.cancel()
+        await self._disconnect()
+
+    def get_stats(self):
+        sent = self._stats["sent"]
+        return {
+            **self._stats,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "awaiting_retry": len(self._retrying),
+            "connected": bool(self._smtp and self._smtp.is_connected),
+            "avg_send_ms": round(self._stats["total_send_ms"] / sent, 3) if sent else 0.0,
+            "avg_queue_wait_ms": round(self._stats["total_queue_wait_ms"] / self._stats["dequeued"], 3)
+            if self._stats["dequeued"] else 0.0,
+        }
+
+
+mail_outbox = MailOutbox()
@@ -1,19 +1,7 @@
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from app.core.config import settings
+from app.services.mail_outbox import build_message, mail_outbox
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.MAIL_USERNAME,
-    MAIL_PASSWORD=settings.MAIL_PASSWORD,
-    MAIL_FROM=settings.MAIL_FROM,
-    MAIL_PORT=settings.MAIL_PORT,
-    MAIL_SERVER=settings.MAIL_SERVER,
-    MAIL_STARTTLS=True,
-    MAIL_SSL_TLS=False,
-    USE_CREDENTIALS=True
-)
 
-
-async def send_verification_email(email: str, token: str):
+def send_verification_email(email: str, token: str):
     # ✅ Use your real domain in production
     verification_link = f"http://localhost:8000/auth/verify-email?token={token}"
 
@@ -45,17 +33,10 @@ async def send_verification_email(email: str, token: str):
     </html>
     """
 
-    message = MessageSchema(
-        subject="Please Verify Your Email",
-        recipients=[email],
-        body=html_content,
-        subtype=MessageType.html  # ✅ send as HTML
-    )
-
-    fm = FastMail(conf)
-    await fm.send_message(message)
+    # ✅ Queued for the outbox worker; signup doesn't wait on SMTP
+    mail_outbox.enqueue(build_message(email, "Please Verify Your Email", html_content, plain_text))
 
-async def send_reset_password_email(email: str, token: str):
+def send_reset_password_email(email: str, token: str):
     reset_link = f"http://localhost:8000/auth/reset-password?token={token}"
 
     html_content = f"""
@@ -72,14 +53,11 @@ async def send_reset_password_email(email: str, token: str):
     </html>
     """
 
-    message = MessageSchema(
-        subject="Reset your password",
-        recipients=[email],
-        body=html_content,
-        subtype="html"
+    plain_text = (
+        f"Hi,\n\n"
+        f"You requested a password reset. Open the link below to set a new password:\n"
+        f"{reset_link}\n\n"
+        "This link will expire in 15 minutes. If you didn’t request it, you can ignore this email."
     )
 
-    fm = FastMail(conf)
-    await fm.send_message(message)
-
-
+    mail_outbox.enqueue(build_message(email, "Reset your password", html_content, plain_text))
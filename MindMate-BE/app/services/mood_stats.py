@@ -0,0 +1,199 @@
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+import pytz
+from sqlalchemy import select, update, delete, func, cast, Date, Integer, literal_column, false
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.db import models
+from app.db.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+Rollup = models.MoodDailyRollup
+MoodLog = models.MoodLog
+MOOD_VALUES = range(1, 6)
+_tz = pytz.timezone(settings.USER_TIMEZONE)
+
+
+def local_day(created_at: datetime) -> date:
+    """mood_logs.created_at is naive UTC; rollups are bucketed by the user's local day."""
+    return pytz.utc.localize(created_at).astimezone(_tz).date()
+
+
+def local_today() -> date:
+    return datetime.now(_tz).date()
+
+
+async def _apply_deltas(db: AsyncSession, user_id, day: date, deltas: dict):
+    stmt = insert(Rollup).values(user_id=user_id, day=day, **deltas)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[Rollup.user_id, Rollup.day],
+        set_={column: getattr(Rollup, column) + getattr(stmt.excluded, column) for column in deltas}
+    ))
+
+
+async def record_mood(db: AsyncSession, user_id, created_at: datetime, mood: int, sign: int = 1):
+    """
+    Adds (sign=1) or removes (sign=-1) one log from its day's rollup.
+    Runs in the caller's transaction, so the rollup commits with the log itself.
+    """
+    day = local_day(created_at)
+    await _apply_deltas(db, user_id, day, {"count": sign, "total": sign * mood, f"count_{mood}": sign})
+
+    if sign < 0:
+        await db.execute(delete(Rollup).where(Rollup.user_id == user_id, Rollup.day == day, Rollup.count <= 0))
+
+
+async def record_moods(db: AsyncSession, user_id, logs):
+    """Bulk version of `record_mood` for new logs: one upsert per day instead of per log."""
+    per_day: dict = {}
+    for created_at, mood in logs:
+        deltas = per_day.setdefault(local_day(created_at), {"count": 0, "total": 0})
+        deltas["count"] += 1
+        deltas["total"] += mood
+        deltas[f"count_{mood}"] = deltas.get(f"count_{mood}", 0) + 1
+
+    for day, deltas in per_day.items():
+        await _apply_deltas(db, user_id, day, deltas)
+
+
+async def reconcile_rollups() -> int:
+    """
+    Folds logs that were written without their rollup (in_rollup = false, i.e. by
+    pods still on a release that didn't maintain rollups) into mood_daily_rollups,
+    one batch per statement. Flipping the flag and adding the counts happen in the
+    same statement, so a log is never counted twice.
+    """
+    pending = (
+        select(MoodLog.id)
+        .where(MoodLog.in_rollup == false(), MoodLog.created_at.is_not(None))
+        .limit(settings.MOOD_ROLLUP_RECONCILE_BATCH)
+        # ✅ Rows a request is updating or deleting right now wait for the next pass
+        .with_for_update(skip_locked=True)
+        .cte("pending")
+    )
+    folded = (
+        update(MoodLog)
+        .where(MoodLog.id == pending.c.id)
+        .values(in_rollup=True)
+        .returning(MoodLog.user_id, MoodLog.created_at, MoodLog.mood)
+        .cte("folded")
+    )
+    # Literal (not bound) arguments so the GROUP BY expression matches the SELECT one exactly;
+    # the zone name was already validated by pytz above
+    day = func.date(func.timezone(
+        literal_column(f"'{settings.USER_TIMEZONE}'"),
+        func.timezone(literal_column("'UTC'"), folded.c.created_at)
+    ))
+    columns = ["count", "total", *[f"count_{m}" for m in MOOD_VALUES]]
+    upsert = insert(Rollup).from_select(
+        ["user_id", "day", *columns],
+        select(
+            folded.c.user_id,
+            day,
+            func.count(),
+            func.sum(folded.c.mood),
+            *[func.count().filter(folded.c.mood == m) for m in MOOD_VALUES],
+        ).group_by(folded.c.user_id, day)
+    )
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[Rollup.user_id, Rollup.day],
+        set_={column: getattr(Rollup, column) + getattr(upsert.excluded, column) for column in columns}
+    )
+    stmt = select(func.count()).select_from(folded).add_cte(upsert.cte("upserted"))
+
+    reconciled = 0
+    async with SessionLocal() as db:
+        while True:
+            batch = await db.scalar(stmt)
+            await db.commit()
+            reconciled += batch
+            if batch < settings.MOOD_ROLLUP_RECONCILE_BATCH:
+                return reconciled
+
+
+async def run_rollup_reconciler():
+    while True:
+        try:
+            reconciled = await reconcile_rollups()
+            if reconciled:
+                logger.info("Folded %s mood logs into their daily rollups", reconciled)
+        except Exception:
+            logger.exception("Mood rollup reconcile failed")
+        await asyncio.sleep(settings.MOOD_ROLLUP_RECONCILE_INTERVAL_SECONDS)
+
+
+def _average(total, count):
+    return round(total / count, 2) if count else None
+
+
+def _truncated(unit: str):
+    # ✅ Literal unit, so the grouped expression isn't a separate bind parameter from the selected one
+    return cast(func.date_trunc(literal_column(f"'{unit}'"), Rollup.day), Date)
+
+
+async def _series(db: AsyncSession, user_id, bucket, start: date, end: date):
+    rows = await db.execute(
+        select(bucket.label("start"), func.sum(Rollup.total), func.sum(Rollup.count))
+        .where(Rollup.user_id == user_id, Rollup.day.between(start, end))
+        .group_by(bucket)
+        .order_by(bucket)
+    )
+    return [{"start": row[0], "average": _average(row[1], row[2]), "count": row[2]} for row in rows]
+
+
+async def _streaks(db: AsyncSession, user_id):
+    # ✅ Gaps and islands: consecutive days share the same (day - row_number)
+    numbered = (
+        select(
+            Rollup.day,
+            (Rollup.day - cast(func.row_number().over(order_by=Rollup.day), Integer)).label("grp")
+        )
+        .where(Rollup.user_id == user_id)
+        .subquery()
+    )
+    islands = (
+        select(func.max(numbered.c.day).label("last_day"), func.count().label("length"))
+        .group_by(numbered.c.grp)
+        .subquery()
+    )
+
+    longest = await db.scalar(select(func.max(islands.c.length))) or 0
+    latest = (await db.execute(
+        select(islands.c.last_day, islands.c.length).order_by(islands.c.last_day.desc()).limit(1)
+    )).first()
+
+    current = 0
+    # A streak is still alive if today's mood hasn't been logged yet
+    if latest and latest.last_day >= local_today() - timedelta(days=1):
+        current = latest.length
+
+    return {"current": current, "longest": longest, "last_logged_on": latest.last_day if latest else None}
+
+
+async def get_mood_stats(db: AsyncSession, user_id, start: date | None = None, end: date | None = None):
+    end = end or local_today()
+    start = start or end - timedelta(days=settings.MOOD_STATS_DEFAULT_DAYS - 1)
+
+    totals = (await db.execute(
+        select(
+            func.coalesce(func.sum(Rollup.count), 0),
+            func.coalesce(func.sum(Rollup.total), 0),
+            *[func.coalesce(func.sum(getattr(Rollup, f"count_{m}")), 0) for m in MOOD_VALUES],
+        )
+        .where(Rollup.user_id == user_id, Rollup.day.between(start, end))
+    )).one()
+
+    return {
+        "from_date": start,
+        "to_date": end,
+        "total_logs": totals[0],
+        "average": _average(totals[1], totals[0]),
+        "distribution": {m: totals[1 + m] for m in MOOD_VALUES},
+        "daily": await _series(db, user_id, Rollup.day, start, end),
+        "weekly": await _series(db, user_id, _truncated("week"), start, end),
+        "monthly": await _series(db, user_id, _truncated("month"), start, end),
+        "streaks": await _streaks(db, user_id),
+    }
@@ -0,0 +1,76 @@
+import base64
+from datetime import date, datetime, time, timedelta
+from uuid import UUID
+import pytz
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+from app.core.config import settings
+
+# ✅ Cursors travel in response headers so list bodies keep their existing shape
+BEFORE_CURSOR_HEADER = "X-Before-Cursor"
+AFTER_CURSOR_HEADER = "X-After-Cursor"
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(created_at: datetime, row_id) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), UUID(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _utc_start_of(day: date) -> datetime:
+    local_midnight = pytz.timezone(settings.USER_TIMEZONE).localize(datetime.combine(day, time.min))
+    return local_midnight.astimezone(pytz.utc).replace(tzinfo=None)
+
+
+def filter_created_between(stmt, created_col, from_date: date | None, to_date: date | None):
+    """Inclusive `from`/`to` calendar days (USER_TIMEZONE) against a naive-UTC timestamp column."""
+    if from_date and to_date and from_date > to_date:
+        raise HTTPException(status_code=400, detail="'from' must be on or before 'to'")
+    if from_date:
+        stmt = stmt.where(created_col >= _utc_start_of(from_date))
+    if to_date:
+        stmt = stmt.where(created_col < _utc_start_of(to_date + timedelta(days=1)))
+    return stmt
+
+
+def set_cursor_headers(response, oldest, newest, has_more: bool, before: str | None, after: str | None):
+    """Cursor to the next older page and/or the next newer page of a keyset listing."""
+    if has_more or after:
+        response.headers[BEFORE_CURSOR_HEADER] = encode_cursor(oldest.created_at, oldest.id)
+    if before or (after and has_more):
+        response.headers[AFTER_CURSOR_HEADER] = encode_cursor(newest.created_at, newest.id)
+
+
+async def keyset_page(db, stmt, created_col, id_col, limit: int, before: str | None = None, after: str | None = None):
+    """
+    Returns `(rows, has_more)` for one page ordered by `(created_at, id)`.
+    `before` walks back towards older rows, `after` forward towards newer ones;
+    with neither, the newest page is returned. `rows` is newest-first except
+    for `after` pages, which come back oldest-first.
+    """
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either 'before' or 'after', not both")
+
+    key = tuple_(created_col, id_col)
+    if after:
+        stmt = stmt.where(key > decode_cursor(after)).order_by(created_col.asc(), id_col.asc())
+    else:
+        if before:
+            stmt = stmt.where(key < decode_cursor(before))
+        stmt = stmt.order_by(created_col.desc(), id_col.desc())
+
+    # ✅ One extra row tells us whether another page exists without a COUNT
+    rows = list((await db.scalars(stmt.limit(limit + 1))).all())
+    has_more = len(rows) > limit
+    return rows[:limit], has_more
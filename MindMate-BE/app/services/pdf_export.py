@@ -1,10 +1,213 @@
-from weasyprint import HTML
+import asyncio
+import glob
+import hashlib
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from jinja2 import Environment
+from markupsafe import Markup, escape
+from app.core.config import settings
 
-def export_chat_to_pdf(conversation_title, messages):
-    html_content = f"<h1>{conversation_title}</h1><hr>"
-    for msg in messages:
-        sender = "You" if msg.sender == "user" else "MindMate"
-        html_content += f"<p><b>{sender}:</b> {msg.text}</p>"
+# ✅ WhatsApp-style chat layout, compiled once and rendered in a single pass
+CONVERSATION_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+  <meta charset="utf-8">
+  <style>
+    body {
+      font-family: "Helvetica Neue", sans-serif;
+      background: #e5ddd5;
+      margin: 0;
+      padding: 20px;
+    }
+    h2 {
+      text-align: center;
+      margin-bottom: 20px;
+      color: #333;
+    }
+    .chat {
+      display: flex;
+      flex-direction: column;
+      gap: 10px;
+    }
+    .message {
+      max-width: 65%;
+      padding: 10px 14px;
+      border-radius: 8px;
+      font-size: 14px;
+      line-height: 1.4;
+      position: relative;
+      word-wrap: break-word;
+    }
+    .user {
+      align-self: flex-end;
+      background: #dcf8c6;
+      color: #111;
+    }
+    .assistant {
+      align-self: flex-start;
+      background: #ffffff;
+      color: #000;
+    }
+    .timestamp {
+      font-size: 10px;
+      color: #777;
+      text-align: right;
+      margin-top: 4px;
+    }
+  </style>
+</head>
+<body>
+  <h2>{{ title }}</h2>
+  <p style="text-align:center; font-size:12px; color:#666; margin-top:-10px; margin-bottom:20px;">
+    {{ chat_date }}
+  </p>
+  <div class="chat">
+  {% for msg in messages %}
+    <div class="message {{ 'user' if msg.role == 'user' else 'assistant' }}">
+      {{ msg.text | nl2br }}
+      <div class="timestamp">{{ msg.time }}</div>
+    </div>
+  {% endfor %}
+  </div>
+</body>
+</html>
+"""
 
-    pdf_bytes = HTML(string=html_content).write_pdf()
-    return pdf_bytes
+
+def _nl2br(text: str) -> Markup:
+    return escape(text).replace("\n", Markup("<br>"))
+
+
+_env = Environment(autoescape=True)
+_env.filters["nl2br"] = _nl2br
+_template = _env.from_string(CONVERSATION_TEMPLATE)
+
+# ✅ wkhtmltopdf/WeasyPrint are blocking, so they only ever run on these workers
+_render_pool = ThreadPoolExecutor(
+    max_workers=settings.PDF_RENDER_WORKERS,
+    thread_name_prefix="pdf-render"
+)
+_render_slots = asyncio.Semaphore(settings.PDF_RENDER_WORKERS + settings.PDF_RENDER_MAX_QUEUE)
+_in_flight: dict = {}
+
+_stats = {"renders": 0, "cache_hits": 0, "shared_renders": 0, "rejected": 0, "total_render_ms": 0.0}
+
+
+def render_conversation_html(title: str, chat_date: str, messages) -> str:
+    return _template.render(title=title, chat_date=chat_date, messages=messages)
+
+
+def html_to_pdf(html: str) -> bytes:
+    if settings.PDF_RENDERER == "weasyprint":
+        from weasyprint import HTML  # optional dependency, only needed for this renderer
+        return HTML(string=html).write_pdf()
+
+    import pdfkit
+    return pdfkit.from_string(html, False)
+
+
+def _cache_key(conversation_id, updated_at, title) -> str:
+    stamp = updated_at.isoformat() if updated_at else ""
+    digest = hashlib.sha256(f"{stamp}|{title}".encode()).hexdigest()[:16]
+    return f"{conversation_id}-{digest}"
+
+
+def _cache_path(key: str) -> str:
+    return os.path.join(settings.PDF_CACHE_DIR, f"{key}.pdf")
+
+
+def _write_cached(conversation_id, key: str, pdf_bytes: bytes) -> str:
+    os.makedirs(settings.PDF_CACHE_DIR, exist_ok=True)
+
+    # ✅ Write to a private temp file, then atomically swap it in
+    fd, tmp_path = tempfile.mkstemp(dir=settings.PDF_CACHE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(pdf_bytes)
+    path = _cache_path(key)
+    os.replace(tmp_path, path)
+
+    # ✅ Older renders of this conversation are now out of date
+    remove_cached_pdfs(conversation_id, keep=path)
+    return path
+
+
+def _render_to_cache(conversation_id, key: str, html: str) -> str:
+    started = time.perf_counter()
+    pdf_bytes = html_to_pdf(html)
+    _stats["total_render_ms"] += (time.perf_counter() - started) * 1000
+    _stats["renders"] += 1
+    return _write_cached(conversation_id, key, pdf_bytes)
+
+
+async def get_conversation_pdf(convo, chat_date: str, load_messages) -> str:
+    """
+    Returns the path of a PDF for `convo`, rendering it only if the cached copy
+    is older than the conversation's last update. `load_messages` is awaited
+    only on a cache miss and must return the template's message dicts.
+    Concurrent requests for the same version share one render.
+    """
+    key = _cache_key(convo.id, convo.updated_at, convo.title)
+    path = _cache_path(key)
+    if os.path.exists(path):
+        _stats["cache_hits"] += 1
+        return path
+
+    if key in _in_flight:
+        _stats["shared_renders"] += 1
+        return await asyncio.shield(_in_flight[key])
+
+    if _render_slots.locked():
+        _stats["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="PDF export is busy, please try again shortly",
+            headers={"Retry-After": "5"}
+        )
+
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[key] = future
+    try:
+        async with _render_slots:
+            html = render_conversation_html(convo.title, chat_date, await load_messages())
+            path = await asyncio.get_running_loop().run_in_executor(
+                _render_pool, _render_to_cache, convo.id, key, html
+            )
+        future.set_result(path)
+        return path
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as exc:
+        future.set_exception(exc)
+        future.exception()  # ✅ mark retrieved so an unshared failure isn't logged as unhandled
+        raise
+    finally:
+        _in_flight.pop(key, None)
+
+
+def remove_cached_pdfs(conversation_id, keep: str | None = None):
+    for old in glob.glob(os.path.join(settings.PDF_CACHE_DIR, f"{conversation_id}-*.pdf")):
+        if old == keep:
+            continue
+        try:
+            os.remove(old)
+        except FileNotFoundError:
+            pass
+
+
+def get_stats():
+    renders = _stats["renders"]
+    return {
+        **_stats,
+        "in_flight": len(_in_flight),
+        "workers": settings.PDF_RENDER_WORKERS,
+        "avg_render_ms": round(_stats["total_render_ms"] / renders, 2) if renders else 0.0,
+    }
+
+
+def shutdown():
+    _render_pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,181 @@
+import logging
+import math
+import time
+from cachetools import TTLCache
+from jose import jwt, JWTError
+from starlette.responses import JSONResponse
+from app.core.config import settings
+from app.services.cache import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class RateRule:
+    """Token bucket: `capacity` requests in a burst, refilled at `per_minute`."""
+
+    def __init__(self, name: str, capacity: int, per_minute: float):
+        self.name = name
+        self.capacity = capacity
+        self.refill_per_second = per_minute / 60.0
+
+
+# (method, path) -> rule; chat sends are the expensive ones (two LLM calls each)
+_chat = RateRule("chat", settings.RATE_LIMIT_CHAT_BURST, settings.RATE_LIMIT_CHAT_PER_MINUTE)
+_login = RateRule("login", settings.RATE_LIMIT_LOGIN_BURST, settings.RATE_LIMIT_LOGIN_PER_MINUTE)
+_forgot = RateRule("forgot_password", settings.RATE_LIMIT_FORGOT_PASSWORD_BURST, settings.RATE_LIMIT_FORGOT_PASSWORD_PER_MINUTE)
+
+ROUTE_RULES = {
+    ("POST", "/chat/send"): _chat,
+    ("POST", "/chat/send/stream"): _chat,
+    ("POST", "/auth/login"): _login,
+    ("POST", "/auth/forgot-password"): _forgot,
+}
+
+
+class MemoryBuckets:
+    def __init__(self, maxsize: int = 100000):
+        # ✅ Idle buckets refill to full anyway, so forgetting them after an hour is safe
+        self._buckets = TTLCache(maxsize=maxsize, ttl=3600)
+
+    async def take(self, keys: list, rule: RateRule) -> float:
+        """
+        Consume one token from every bucket in `keys`, or from none of them.
+        Returns 0 if allowed, else seconds until all of them have a token.
+        """
+        now = time.monotonic()
+        levels = []
+        for key in keys:
+            tokens, updated = self._buckets.get(key, (rule.capacity, now))
+            levels.append(min(rule.capacity, tokens + (now - updated) * rule.refill_per_second))
+
+        wait = max(((1 - tokens) / rule.refill_per_second for tokens in levels if tokens < 1), default=0.0)
+        for key, tokens in zip(keys, levels):
+            self._buckets[key] = (tokens if wait else tokens - 1, now)
+        return wait
+
+
+# Refill all buckets and take from each in one round trip, so replicas can't race each
+# other and a request rejected by one bucket doesn't use up the others
+_TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+  local bucket = redis.call('HMGET', key, 'tokens', 'updated')
+  local tokens = tonumber(bucket[1]) or capacity
+  local updated = tonumber(bucket[2]) or now
+  tokens = math.min(capacity, tokens + math.max(now - updated, 0) * rate)
+  if tokens < 1 then
+    wait = math.max(wait, (1 - tokens) / rate)
+  end
+  levels[i] = tokens
+end
+for i, key in ipairs(KEYS) do
+  local tokens = levels[i]
+  if wait == 0 then
+    tokens = tokens - 1
+  end
+  redis.call('HSET', key, 'tokens', tokens, 'updated', now)
+  redis.call('PEXPIRE', key, math.ceil(capacity / rate * 1000) + 1000)
+end
+return tostring(wait)
+"""
+
+
+class RedisBuckets:
+    def __init__(self):
+        self._script = None
+
+    async def take(self, keys: list, rule: RateRule) -> float:
+        if self._script is None:
+            self._script = get_redis().register_script(_TAKE_SCRIPT)
+        wait = await self._script(
+            keys=[f"mindmate:ratelimit:{key}" for key in keys],
+            args=[rule.capacity, rule.refill_per_second, time.time()]
+        )
+        return float(wait)
+
+
+_buckets = RedisBuckets() if settings.CACHE_BACKEND == "redis" else MemoryBuckets()
+_stats = {"checked": 0, "limited": {}, "backend_errors": 0}
+
+
+def _client_ip(scope) -> str:
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = [value.decode() for name, value in scope["headers"] if name == b"x-forwarded-for"]
+        # ✅ The last hop is the one our proxy appended; anything before it is whatever the client sent
+        hops = [hop.strip() for hop in ",".join(forwarded).split(",") if hop.strip()]
+        if hops:
+            return hops[-1]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def _token_subject(scope) -> str | None:
+    """Who the bearer token belongs to; just a bucket key, real auth happens in the route."""
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode().partition(" ")
+            if scheme.lower() != "bearer":
+                return None
+            try:
+                return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]).get("sub")
+            except JWTError:
+                return None
+    return None
+
+
+class RateLimitMiddleware:
+    """
+    Applies ROUTE_RULES with one bucket per client IP and, for authenticated
+    calls, one per user. Over-limit requests get 429 with Retry-After.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        rule = None
+        if scope["type"] == "http" and settings.RATE_LIMIT_ENABLED:
+            rule = ROUTE_RULES.get((scope["method"], scope["path"].rstrip("/") or "/"))
+        if rule is None:
+            return await self.app(scope, receive, send)
+
+        keys = [f"{rule.name}:ip:{_client_ip(scope)}"]
+        subject = _token_subject(scope)
+        if subject:
+            keys.append(f"{rule.name}:user:{subject}")
+
+        _stats["checked"] += 1
+        wait = 0.0
+        try:
+            wait = await _buckets.take(keys, rule)
+        except Exception:
+            # ✅ Fail open: a cache outage shouldn't take the API down with it
+            _stats["backend_errors"] += 1
+            logger.exception("Rate limit check failed")
+
+        if wait > 0:
+            _stats["limited"][rule.name] = _stats["limited"].get(rule.name, 0) + 1
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": "Too many requests, please slow down"},
+                headers={"Retry-After": str(math.ceil(wait))}
+            )
+            return await response(scope, receive, send)
+
+        await self.app(scope, receive, send)
+
+
+def get_stats():
+    return {
+        **_stats,
+        "backend": settings.CACHE_BACKEND,
+        "enabled": settings.RATE_LIMIT_ENABLED,
+        "rules": {
+            rule.name: {"burst": rule.capacity, "per_minute": round(rule.refill_per_second * 60, 3)}
+            for rule in ROUTE_RULES.values()
+        },
+    }
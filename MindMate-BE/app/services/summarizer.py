@@ -0,0 +1,138 @@
+import asyncio
+import logging
+from datetime import datetime
+from sqlalchemy import select, update, tuple_, literal
+from sqlalchemy.dialects.postgresql import UUID
+from app.core.config import settings
+from app.db import models
+from app.db.database import SessionLocal
+from app.services.encryption import decrypt_stored_message
+from app.services.gpt_client import summarize_conversation
+
+logger = logging.getLogger(__name__)
+
+
+class SummaryScheduler:
+    """
+    Refreshes `Conversation.summary` in the background, one job per conversation.
+    Sends that arrive while a job is pending collapse into that job; sends that
+    arrive while it is running trigger exactly one more pass afterwards.
+    """
+
+    def __init__(self, debounce_seconds: float):
+        self.debounce_seconds = debounce_seconds
+        self._pending: dict = {}
+        self._dirty: set = set()
+        self._stats = {"scheduled": 0, "coalesced": 0, "completed": 0, "failed": 0}
+
+    def schedule(self, conversation_id):
+        self._stats["scheduled"] += 1
+        if conversation_id in self._pending:
+            self._dirty.add(conversation_id)
+            self._stats["coalesced"] += 1
+            return
+
+        self._pending[conversation_id] = asyncio.create_task(self._run(conversation_id))
+
+    def is_pending(self, conversation_id) -> bool:
+        return conversation_id in self._pending
+
+    async def _run(self, conversation_id):
+        try:
+            while True:
+                # ✅ Debounce window: anything scheduled during it rides along
+                await asyncio.sleep(self.debounce_seconds)
+                self._dirty.discard(conversation_id)
+
+                try:
+                    if await self._summarize(conversation_id):
+                        # ✅ A backlog bigger than one batch keeps folding, oldest first
+                        self._dirty.add(conversation_id)
+                    self._stats["completed"] += 1
+                except Exception:
+                    self._stats["failed"] += 1
+                    logger.exception("Summary refresh failed for conversation %s", conversation_id)
+
+                if conversation_id not in self._dirty:
+                    break
+        finally:
+            self._pending.pop(conversation_id, None)
+
+    async def _summarize(self, conversation_id) -> bool:
+        """Folds the next batch of unsummarized messages into the summary; True if more remain."""
+        async with SessionLocal() as db:
+            convo = await db.get(models.Conversation, conversation_id)
+            if not convo:
+                return False
+
+            batch_size = settings.SUMMARY_MAX_NEW_MESSAGES
+            stmt = select(models.Message).where(models.Message.conversation_id == conversation_id)
+            if convo.summary and not convo.summarized_until:
+                # A summary without a mark (written before the mark existed) already covers
+                # the history; seed the mark from the latest messages, not the first ones
+                new_msgs = list((await db.scalars(
+                    stmt.order_by(models.Message.created_at.desc(), models.Message.id.desc()).limit(batch_size)
+                )).all())
+                new_msgs.reverse()
+                has_more = False
+            else:
+                if convo.summarized_until:
+                    # ✅ Compared as (created_at, id), so messages sharing the mark's timestamp
+                    # are neither skipped nor folded twice
+                    stmt = stmt.where(
+                        tuple_(models.Message.created_at, models.Message.id) > tuple_(
+                            literal(convo.summarized_until),
+                            literal(convo.summarized_until_id, UUID(as_uuid=True)),
+                        )
+                    )
+                # ✅ The oldest messages past the mark, so none are skipped when more are pending
+                new_msgs = list((await db.scalars(
+                    stmt.order_by(models.Message.created_at, models.Message.id).limit(batch_size + 1)
+                )).all())
+                has_more = len(new_msgs) > batch_size
+                new_msgs = new_msgs[:batch_size]
+            if not new_msgs:
+                return False
+
+            previous_until = (convo.summarized_until, convo.summarized_until_id)
+            previous_summary = convo.summary
+            new_until = (new_msgs[-1].created_at, new_msgs[-1].id)
+            transcript = [{"sender": m.sender, "text": decrypt_stored_message(m)} for m in new_msgs]
+
+            # ✅ Don't hold a transaction open across the LLM call
+            await db.rollback()
+            new_summary = await summarize_conversation(transcript, previous_summary=previous_summary)
+
+            # ✅ Only advance the mark if nobody else moved it while we were waiting on the LLM
+            result = await db.execute(
+                update(models.Conversation)
+                .where(
+                    models.Conversation.id == conversation_id,
+                    models.Conversation.summarized_until.is_not_distinct_from(previous_until[0]),
+                    models.Conversation.summarized_until_id.is_not_distinct_from(previous_until[1]),
+                )
+                .values(
+                    summary=new_summary,
+                    summarized_until=new_until[0],
+                    summarized_until_id=new_until[1],
+                    summary_updated_at=datetime.utcnow(),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            if not result.rowcount:
+                logger.info("Dropped stale summary for conversation %s", conversation_id)
+                return False
+            return has_more
+
+    async def shutdown(self):
+        tasks = list(self._pending.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_stats(self):
+        return {**self._stats, "pending": len(self._pending)}
+
+
+summary_scheduler = SummaryScheduler(settings.SUMMARY_DEBOUNCE_SECONDS)
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+import math
+import time
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Every chat message costs a few tokens of framing on top of its content
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+# A failed load (no baked-in cache, no network) is retried, just not on every message
+LOAD_RETRY_SECONDS = 300.0
+
+_encoding = None
+_last_attempt = float("-inf")
+_loading: asyncio.Task | None = None
+
+
+def load_encoding():
+    """
+    Blocking: the first load reads the BPE file from TIKTOKEN_CACHE_DIR (baked
+    into the image) or downloads it. Only call it from a worker thread.
+    Failures aren't remembered; the next attempt tries again.
+    """
+    global _encoding, _last_attempt
+    _last_attempt = time.monotonic()
+    try:
+        import tiktoken
+        try:
+            _encoding = tiktoken.encoding_for_model(settings.OPENAI_MODEL)
+        except KeyError:
+            _encoding = tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # ✅ ~4 chars/token is close enough for budgeting until the encoding loads
+        logger.warning("tiktoken encoding unavailable, estimating token counts from length", exc_info=True)
+    return _encoding
+
+
+async def warm_up():
+    """Called from the app lifespan so the first chat doesn't pay for (or block on) the load."""
+    await asyncio.to_thread(load_encoding)
+
+
+def _schedule_reload():
+    global _loading
+    if _loading is not None or time.monotonic() - _last_attempt < LOAD_RETRY_SECONDS:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+
+    def done(_task):
+        global _loading
+        _loading = None
+    _loading = loop.create_task(asyncio.to_thread(load_encoding))
+    _loading.add_done_callback(done)
+
+
+def count_tokens(text: str) -> int:
+    # ✅ Never loads inline: this runs on the event loop while building prompts
+    if _encoding is None:
+        _schedule_reload()
+        return math.ceil(len(text) / 4)
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(message: dict) -> int:
+    return TOKENS_PER_MESSAGE + count_tokens(message["content"])
@@ -0,0 +1,200 @@
+import asyncio
+import hashlib
+import logging
+import uuid
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from jose import jwt, JWTError
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.security import create_access_token, create_refresh_token
+from app.db import models
+from app.db.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+def _hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _decode_refresh_token(token: str) -> dict:
+    try:
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+
+
+async def issue_token_pair(db: AsyncSession, user, device: str | None = None, family_id=None):
+    """
+    Creates an access token plus a refresh token backed by a new session row.
+    Without `family_id` this starts a new device session.
+    """
+    session_id = uuid.uuid4()
+    family_id = family_id or uuid.uuid4()
+
+    access_token = create_access_token(
+        {"sub": user.email},
+        expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    refresh_token = create_refresh_token(
+        {"sub": user.email, "jti": str(session_id), "fam": str(family_id)}
+    )
+
+    db.add(models.RefreshSession(
+        id=session_id,
+        user_id=user.id,
+        family_id=family_id,
+        token_hash=_hash_token(refresh_token),
+        device=device[:255] if device else None,
+        expires_at=datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    ))
+    await db.commit()
+    return access_token, refresh_token
+
+
+async def _revoke_family(db: AsyncSession, family_id):
+    await db.execute(
+        update(models.RefreshSession)
+        .where(models.RefreshSession.family_id == family_id, models.RefreshSession.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+    )
+    await db.commit()
+
+
+async def _load_session(db: AsyncSession, payload: dict, refresh_token: str):
+    """Returns `(session, user)` for a presented refresh token or raises 401."""
+    invalid = HTTPException(status_code=401, detail="Invalid refresh token or user")
+
+    try:
+        session_id = uuid.UUID(payload.get("jti") or "")
+    except ValueError:
+        raise invalid
+
+    session = await db.get(models.RefreshSession, session_id)
+    if not session or session.token_hash != _hash_token(refresh_token):
+        raise invalid
+
+    user = await db.get(models.User, session.user_id)
+    if not user or user.email != payload.get("sub"):
+        raise invalid
+    return session, user
+
+
+async def rotate_refresh_token(db: AsyncSession, refresh_token: str, device: str | None = None):
+    """
+    Exchanges a refresh token for a new pair in the same family. Presenting a
+    token that was already rotated means it leaked, so the whole family is revoked.
+    """
+    payload = _decode_refresh_token(refresh_token)
+    if "jti" not in payload:
+        return await _migrate_legacy_token(db, payload, refresh_token, device)
+
+    session, user = await _load_session(db, payload, refresh_token)
+
+    if session.revoked_at or session.expires_at < datetime.utcnow():
+        raise HTTPException(status_code=401, detail="Refresh token expired or revoked")
+
+    # ✅ Claim the token atomically so two concurrent refreshes can't both rotate it
+    claimed = await db.execute(
+        update(models.RefreshSession)
+        .where(models.RefreshSession.id == session.id, models.RefreshSession.rotated_at.is_(None))
+        .values(rotated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if not claimed.rowcount:
+        logger.warning("Refresh token reuse detected for family %s", session.family_id)
+        await _revoke_family(db, session.family_id)
+        raise HTTPException(status_code=401, detail="Refresh token already used")
+
+    return await issue_token_pair(db, user, device=device or session.device, family_id=session.family_id)
+
+
+async def _migrate_legacy_token(db: AsyncSession, payload: dict, refresh_token: str, device: str | None):
+    """Tokens issued before session rows existed were stored on users.refresh_token."""
+    user = await db.scalar(select(models.User).where(models.User.email == payload.get("sub")))
+    if not user or not user.refresh_token or user.refresh_token != refresh_token:
+        raise HTTPException(status_code=401, detail="Invalid refresh token or user")
+
+    user.refresh_token = None
+    return await issue_token_pair(db, user, device=device)
+
+
+async def revoke_refresh_token(db: AsyncSession, refresh_token: str):
+    """Logs out the device that owns this token; returns the user."""
+    payload = _decode_refresh_token(refresh_token)
+    if "jti" not in payload:
+        user = await db.scalar(select(models.User).where(models.User.email == payload.get("sub")))
+        if not user or user.refresh_token != refresh_token:
+            raise HTTPException(status_code=401, detail="Invalid refresh token or user")
+        user.refresh_token = None
+        await db.commit()
+        return user
+
+    session, user = await _load_session(db, payload, refresh_token)
+    await _revoke_family(db, session.family_id)
+    return user
+
+
+async def list_active_sessions(db: AsyncSession, user_id):
+    """Newest live token of each device family for a user."""
+    now = datetime.utcnow()
+    rows = (await db.scalars(
+        select(models.RefreshSession)
+        .where(
+            models.RefreshSession.user_id == user_id,
+            models.RefreshSession.revoked_at.is_(None),
+            models.RefreshSession.rotated_at.is_(None),
+            models.RefreshSession.expires_at > now
+        )
+        .order_by(models.RefreshSession.created_at.desc())
+    )).all()
+    return rows
+
+
+async def revoke_session_family(db: AsyncSession, user_id, family_id) -> bool:
+    result = await db.execute(
+        update(models.RefreshSession)
+        .where(
+            models.RefreshSession.user_id == user_id,
+            models.RefreshSession.family_id == family_id,
+            models.RefreshSession.revoked_at.is_(None)
+        )
+        .values(revoked_at=datetime.utcnow())
+    )
+    await db.commit()
+    return bool(result.rowcount)
+
+
+async def purge_expired_sessions(batch_size: int = settings.REFRESH_SESSION_PURGE_BATCH) -> int:
+    """Deletes expired session rows in small batches so no single statement holds long locks."""
+    purged = 0
+    async with SessionLocal() as db:
+        while True:
+            expired_ids = (
+                select(models.RefreshSession.id)
+                .where(models.RefreshSession.expires_at < datetime.utcnow())
+                .limit(batch_size)
+                .scalar_subquery()
+            )
+            result = await db.execute(
+                delete(models.RefreshSession)
+                .where(models.RefreshSession.id.in_(expired_ids))
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            purged += result.rowcount
+            if result.rowcount < batch_size:
+                return purged
+
+
+async def run_session_purger():
+    while True:
+        await asyncio.sleep(settings.REFRESH_SESSION_PURGE_INTERVAL_SECONDS)
+        try:
+            purged = await purge_expired_sessions()
+            if purged:
+                logger.info("Purged %s expired refresh sessions", purged)
+        except Exception:
+            logger.exception("Refresh session purge failed")
@@ -0,0 +1,141 @@
+import logging
+import re
+import time
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Positive weights push towards "off topic". Generic words that show up in
+# ordinary venting ("my boss made me debug the server all night") weigh
+# nothing; they're listed so they still appear in the routing logs.
+OFF_TOPIC_TERMS = {
+    # programming
+    "python": 1.5, "javascript": 1.5, "typescript": 1.5, "java": 1.5, "c++": 1.5, "golang": 1.5,
+    "compile": 1.5, "compiler": 1.5, "regex": 2.0, "sql": 2.0, "html": 1.5, "css": 1.5,
+    "algorithm": 1.5, "stack trace": 3.0, "source code": 3.0, "write a program": 3.0,
+    "write a function": 3.0, "write code": 3.0, "syntax error": 3.0, "null pointer": 3.0,
+    "sql query": 3.0, "python function": 1.5, "python script": 2.0,
+    "code": 0.0, "function": 0.0, "debug": 0.0, "api": 0.0, "variable": 0.0, "error message": 0.0,
+    # math
+    "equation": 2.0, "integral": 2.5, "derivative": 2.0, "algebra": 2.0, "calculus": 2.0,
+    "quadratic": 2.5, "matrix": 1.5, "square root": 2.5, "solve for x": 3.0, "what is the sum": 2.0,
+    "calculate": 0.0, "solve": 0.0, "equals": 0.0, "homework": 0.0,
+    # other technical
+    "docker": 2.0, "kubernetes": 2.5, "linux": 1.5, "command line": 2.0,
+    "install": 0.0, "configure": 0.0, "terminal": 0.0, "router": 0.0, "server": 0.0, "database": 0.0,
+}
+
+# Anything that sounds like the user talking about their own life wins over
+# the technical terms ("I'm so stressed about my python exam" must reach the model).
+WELLNESS_TERMS = {
+    "feel", "feeling", "felt", "anxious", "anxiety", "stress", "stressed", "stressful", "sad", "depressed",
+    "depression", "lonely", "alone", "sleep", "panic", "overwhelmed", "worried", "worry", "cry",
+    "crying", "hurt", "mood", "angry", "anger", "mad", "tired", "exhausted", "exhausting", "scared", "afraid",
+    "hopeless", "therapy", "therapist", "burnout", "burned out", "motivation", "confidence", "grief",
+    "relationship", "suicide", "suicidal", "kill myself", "self harm", "die", "hate myself",
+    "upset", "frustrated", "frustrating", "nervous", "help me cope", "mental",
+    # everyday distress and venting phrasing
+    "hate", "ugh", "annoyed", "annoying", "irritated", "fed up", "sick of", "tired of", "can't take",
+    "cant take", "can't handle", "drives me nuts", "drives me crazy", "nuts", "crazy", "yelling", "yelled",
+    "shouting", "screaming", "fight", "fighting", "argue", "argument", "pressure", "miserable", "awful",
+    "terrible", "unfair", "boss", "manager", "coworker", "dad", "mom", "father", "mother", "parents",
+    "family", "friend", "friends", "partner", "boyfriend", "girlfriend", "husband", "wife", "breakup",
+}
+
+_TASK_VERBS = (
+    r"write|code|program|solve|calculate|compute|evaluate|simplify|differentiate|integrate|implement|"
+    r"debug|fix|refactor|convert|translate|generate|install|configure|set up|setup|deploy"
+)
+
+# Numbers joined by operators. Never enough on its own: a bare "7/10", "3-4" or "24/7" is
+# usually someone answering the bot's own "how are you feeling, 1-10?" questions
+_EXPRESSION = r"[-(]?\s*\d+(?:\.\d+)?\s*\)?(?:\s*[-+*/^x×]\s*\(?\s*-?\d+(?:\.\d+)?\s*\)?)+"
+
+# ✅ Nothing is refused without one of these: an explicit request for the bot to do a task
+_TASK_SIGNALS = (
+    ("<code>", re.compile(r"```|\bdef \w+\(|^\s*(import|from) \w+|</?(div|span|html|script)\b", re.M), 3.0),
+    # a sum the bot is asked to work out: "what is 12 * 7?", "calculate 3/4", "17*23 = ?"
+    ("<arithmetic>", re.compile(
+        rf"^\s*(?:(?:what(?:'s| is)|how much is|calculate|compute|evaluate|solve)\s+{_EXPRESSION}\s*\??"
+        rf"|{_EXPRESSION}\s*=\s*\?)\s*$",
+        re.I
+    ), 3.0),
+    ("<equation>", re.compile(r"\b(\d+|[xyz])\s*[+\-*/^]\s*\d+\s*=|\bsolve for [a-z]\b", re.I), 2.0),
+    # asking the bot to do something; weak on its own, technical terms have to carry the rest
+    ("<request>", re.compile(
+        rf"^\s*(please\s+)?({_TASK_VERBS})\b"
+        rf"|\b(can|could|would|will) you (please )?({_TASK_VERBS})\b"
+        rf"|\b({_TASK_VERBS}) (me|for me)\b"
+        rf"|\bhelp me (to )?({_TASK_VERBS})\b"
+        rf"|\bhow (do|can|would|should) (i|you) ({_TASK_VERBS})\b"
+        rf"|\bhow to ({_TASK_VERBS})\b",
+        re.I | re.M
+    ), 1.0),
+)
+
+_WORD = re.compile(r"[a-z0-9+#']+")
+
+_stats = {"classified": 0, "refused": 0, "would_refuse": 0, "total_us": 0.0}
+
+
+def _ngrams(text: str) -> set:
+    words = _WORD.findall(text.lower())
+    grams = set(words)
+    for n in (2, 3, 4):
+        grams.update(" ".join(words[i:i + n]) for i in range(len(words) - n + 1))
+    return grams
+
+
+def classify_message(text: str, conversation_id=None) -> str:
+    """
+    Routes a chat message to "refuse" (clearly off topic, answer with the canned
+    reply) or "llm". Only an explicit task request with enough technical weight
+    and no sign of the user talking about themselves counts as clearly off topic.
+    In TOPIC_CLASSIFIER_MODE=shadow the verdict is only logged.
+    """
+    if settings.TOPIC_CLASSIFIER_MODE == "off":
+        return "llm"
+
+    started = time.perf_counter()
+    grams = _ngrams(text)
+
+    wellness_hits = sorted(grams & WELLNESS_TERMS)
+    off_topic_hits = sorted(grams & OFF_TOPIC_TERMS.keys())
+    score = sum(OFF_TOPIC_TERMS[term] for term in off_topic_hits)
+    task_signals = []
+    for name, pattern, weight in _TASK_SIGNALS:
+        if pattern.search(text):
+            score += weight
+            task_signals.append(name)
+
+    off_topic = bool(task_signals) and not wellness_hits and score >= settings.TOPIC_OFF_TOPIC_THRESHOLD
+    refuse = off_topic and settings.TOPIC_CLASSIFIER_MODE == "enforce"
+    route = "refuse" if refuse else "llm"
+
+    elapsed_us = (time.perf_counter() - started) * 1_000_000
+    _stats["classified"] += 1
+    _stats["total_us"] += elapsed_us
+    if off_topic:
+        _stats["would_refuse"] += 1
+    if refuse:
+        _stats["refused"] += 1
+
+    # ✅ One line per message so thresholds can be tuned from the logs before enforcing
+    logger.info(
+        "chat routing conversation=%s mode=%s route=%s off_topic=%s score=%.2f signals=%s terms=%s wellness=%s took_us=%.0f",
+        conversation_id, settings.TOPIC_CLASSIFIER_MODE, route, off_topic, score,
+        task_signals, off_topic_hits, wellness_hits, elapsed_us
+    )
+    return route
+
+
+def get_stats():
+    classified = _stats["classified"]
+    return {
+        **_stats,
+        "mode": settings.TOPIC_CLASSIFIER_MODE,
+        "threshold": settings.TOPIC_OFF_TOPIC_THRESHOLD,
+        "refusal_rate": round(_stats["refused"] / classified, 4) if classified else 0.0,
+        "would_refuse_rate": round(_stats["would_refuse"] / classified, 4) if classified else 0.0,
+        "avg_us": round(_stats["total_us"] / classified, 1) if classified else 0.0,
+    }
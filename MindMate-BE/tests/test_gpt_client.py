@@ -0,0 +1,24 @@
+import asyncio
+from app.services import gpt_client
+
+
+def test_cancelled_wait_for_a_slot_is_not_counted_as_waiting(monkeypatch):
+    async def scenario():
+        monkeypatch.setattr(gpt_client, "_llm_slots", asyncio.Semaphore(1))
+        before = gpt_client._stats["waiting"]
+
+        async def queued():
+            async with gpt_client._llm_slot():
+                pass
+
+        async with gpt_client._llm_slot():
+            waiter = asyncio.create_task(queued())
+            await asyncio.sleep(0)
+            assert gpt_client._stats["waiting"] == before + 1
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+
+        assert gpt_client._stats["waiting"] == before
+        assert not gpt_client._llm_slots.locked()
+
+    asyncio.run(scenario())
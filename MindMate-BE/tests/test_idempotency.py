@@ -0,0 +1,89 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from app.core.config import settings
+from app.services import idempotency
+from app.services.cache import MemoryTTLStore
+from app.services.idempotency import run_once
+
+
+@pytest.fixture(autouse=True)
+def fresh_store(monkeypatch):
+    monkeypatch.setattr(idempotency, "_store", MemoryTTLStore())
+    monkeypatch.setattr(settings, "IDEMPOTENCY_POLL_SECONDS", 0.01)
+
+
+class Work:
+    def __init__(self, result=None, delay=0.0, error=None):
+        self.calls = 0
+        self.result = result or {"reply": "hi"}
+        self.delay = delay
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def test_repeat_gets_the_stored_result():
+    work = Work()
+
+    async def scenario():
+        first = await run_once("send", "k1", "fp", work)
+        second = await run_once("send", "k1", "fp", work)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == ({"reply": "hi"}, False)
+    assert second == ({"reply": "hi"}, True)
+    assert work.calls == 1
+
+
+def test_concurrent_duplicate_waits_for_the_first():
+    work = Work(delay=0.05)
+
+    async def scenario():
+        return await asyncio.gather(run_once("send", "k1", "fp", work), run_once("send", "k1", "fp", work))
+
+    results = asyncio.run(scenario())
+    assert sorted(replayed for _, replayed in results) == [False, True]
+    assert work.calls == 1
+
+
+def test_same_key_for_a_different_request_is_rejected():
+    async def scenario():
+        await run_once("send", "k1", "fp-a", Work())
+        await run_once("send", "k1", "fp-b", Work())
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(scenario())
+    assert error.value.status_code == 422
+
+
+def test_failed_attempt_frees_the_key():
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await run_once("send", "k1", "fp", Work(error=RuntimeError("llm down")))
+        return await run_once("send", "k1", "fp", Work())
+
+    assert asyncio.run(scenario()) == ({"reply": "hi"}, False)
+
+
+def test_slow_work_keeps_its_claim_past_the_pending_ttl(monkeypatch):
+    # The send outlives the pending marker's TTL several times over; a retry must still not run it again
+    monkeypatch.setattr(settings, "IDEMPOTENCY_PENDING_TTL_SECONDS", 0.06)
+    work = Work(delay=0.3)
+
+    async def scenario():
+        original = asyncio.create_task(run_once("send", "k1", "fp", work))
+        await asyncio.sleep(0.2)
+        retry = await run_once("send", "k1", "fp", work)
+        return await original, retry
+
+    original, retry = asyncio.run(scenario())
+    assert work.calls == 1
+    assert original == ({"reply": "hi"}, False)
+    assert retry == ({"reply": "hi"}, True)
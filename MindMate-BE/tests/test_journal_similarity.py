@@ -0,0 +1,85 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+from app.services import journal_similarity
+from app.services.journal_similarity import STORE_VECTORS, build_vector, _load_vectors, _rank
+
+
+class Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class StandInSession:
+    """Answers the two selects in _load_vectors and records everything else it's asked to run."""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.writes = []
+        self.commits = 0
+
+    async def execute(self, statement, params=None):
+        if statement is STORE_VECTORS:
+            self.writes.append(params)
+            return Result([])
+        if len(statement.selected_columns) == 2:
+            return Result([SimpleNamespace(id=e.id, similarity_vector=e.similarity_vector) for e in self.entries])
+        return Result([e for e in self.entries if e.similarity_vector is None])
+
+    async def commit(self):
+        self.commits += 1
+
+
+def entry(title, description, tags=None, with_vector=False):
+    e = SimpleNamespace(id=uuid.uuid4(), title=title, description=description, tags=tags, similarity_vector=None)
+    if with_vector:
+        e.similarity_vector = build_vector(title, description, tags)
+    return e
+
+
+def test_vectors_are_stable_and_ignore_stopwords():
+    assert build_vector("Rough day", "I was so tired at work", ["Work"]) == build_vector("rough DAY", "i was SO tired at work", [" work "])
+    assert build_vector("the", "and of to", None) == b""
+
+
+def test_missing_vectors_are_written_back_in_one_statement():
+    entries = [entry("Sleep", "slept badly again", ["sleep"], with_vector=True)] + [
+        entry(f"Day {i}", "long shift at work", ["work"]) for i in range(5)
+    ]
+    db = StandInSession(entries)
+    before = journal_similarity._stats["lazy_backfills"]
+
+    ids, blobs = asyncio.run(_load_vectors(db, uuid.uuid4()))
+
+    assert ids == [e.id for e in entries]
+    assert blobs == [build_vector(e.title, e.description, e.tags) for e in entries]
+    assert len(db.writes) == 1 and db.commits == 1
+    assert db.writes[0]["ids"] == [e.id for e in entries[1:]]
+    assert db.writes[0]["vectors"] == blobs[1:]
+    assert journal_similarity._stats["lazy_backfills"] - before == 5
+
+
+def test_nothing_is_written_when_every_entry_has_a_vector():
+    entries = [entry("Sleep", "slept badly again", with_vector=True), entry("Work", "long shift", with_vector=True)]
+    db = StandInSession(entries)
+
+    asyncio.run(_load_vectors(db, uuid.uuid4()))
+
+    assert db.writes == [] and db.commits == 0
+
+
+def test_rank_prefers_shared_terms():
+    entries = [
+        entry("Exam stress", "worried about the maths exam tomorrow", ["exams"]),
+        entry("Revision", "revised maths for the exam all evening", ["exams"]),
+        entry("Beach", "swam in the sea with friends", ["holiday"]),
+    ]
+    ids = [e.id for e in entries]
+    blobs = [build_vector(e.title, e.description, e.tags) for e in entries]
+
+    ranked = _rank(ids, blobs, ids[0], k=2)
+
+    assert [i for i, _ in ranked] == [ids[1]]
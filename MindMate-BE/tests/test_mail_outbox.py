@@ -0,0 +1,177 @@
+import asyncio
+import socket
+import time
+import pytest
+from aiosmtpd.controller import Controller
+from app.core.config import settings
+from app.services import mail_outbox as outbox_module
+from app.services.mail_outbox import MailOutbox, build_message
+
+
+class StandInHandler:
+    """Local SMTP server: answers each DATA with the next scripted reply, then 250."""
+
+    def __init__(self):
+        self.replies = []
+        self.delivered = []
+        self.attempted_at = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.attempted_at.append(time.monotonic())
+        if self.replies:
+            return self.replies.pop(0)
+        self.delivered.append(envelope)
+        return "250 OK"
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    handler = StandInHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=_free_port())
+    controller.start()
+    monkeypatch.setattr(settings, "MAIL_SERVER", "127.0.0.1")
+    monkeypatch.setattr(settings, "MAIL_PORT", controller.port)
+    monkeypatch.setattr(settings, "MAIL_TLS", False)
+    monkeypatch.setattr(settings, "MAIL_SSL", False)
+    monkeypatch.setattr(settings, "MAIL_USERNAME", "")
+    monkeypatch.setattr(settings, "MAIL_RETRY_BACKOFF_SECONDS", 0.05)
+    monkeypatch.setattr(settings, "MAIL_MAX_ATTEMPTS", 4)
+    yield handler
+    controller.stop()
+
+
+async def _until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for the outbox"
+        await asyncio.sleep(0.01)
+
+
+def _message(to="user@example.com"):
+    return build_message(to, "Verify your email", "<p>hi</p>", "hi")
+
+
+def test_delivers_queued_mail_over_one_connection(smtp_server):
+    async def scenario():
+        outbox = MailOutbox()
+        outbox.start()
+        for i in range(3):
+            outbox.enqueue(_message(f"user{i}@example.com"))
+        await _until(lambda: outbox.get_stats()["sent"] == 3)
+        await outbox.shutdown()
+        return outbox.get_stats()
+
+    stats = asyncio.run(scenario())
+    assert [e.rcpt_tos for e in smtp_server.delivered] == [[f"user{i}@example.com"] for i in range(3)]
+    assert stats["connects"] == 1
+    assert stats["failed"] == 0
+
+
+def test_transient_replies_are_retried_with_backoff(smtp_server):
+    smtp_server.replies = ["451 Try again later", "451 Try again later"]
+
+    async def scenario():
+        outbox = MailOutbox()
+        outbox.start()
+        outbox.enqueue(_message())
+        await _until(lambda: outbox.get_stats()["sent"] == 1)
+        await outbox.shutdown()
+        return outbox.get_stats()
+
+    stats = asyncio.run(scenario())
+    assert len(smtp_server.delivered) == 1
+    assert stats["retries"] == 2
+    assert stats["failed"] == 0
+    # Backoff doubles: 0.05s before the second attempt, 0.1s before the third
+    first, second, third = smtp_server.attempted_at
+    assert second - first >= 0.05
+    assert third - second >= 0.1
+
+
+def test_gives_up_after_max_attempts(smtp_server, monkeypatch):
+    monkeypatch.setattr(settings, "MAIL_MAX_ATTEMPTS", 2)
+    smtp_server.replies = ["421 Service not available"] * 5
+
+    async def scenario():
+        outbox = MailOutbox()
+        outbox.start()
+        outbox.enqueue(_message())
+        await _until(lambda: outbox.get_stats()["failed"] == 1)
+        await outbox.shutdown()
+        return outbox.get_stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["retries"] == 1
+    assert stats["sent"] == 0
+    assert len(smtp_server.attempted_at) == 2
+
+
+def test_permanent_rejection_is_not_retried(smtp_server):
+    smtp_server.replies = ["550 Mailbox unavailable"]
+
+    async def scenario():
+        outbox = MailOutbox()
+        outbox.start()
+        outbox.enqueue(_message())
+        await _until(lambda: outbox.get_stats()["failed"] == 1)
+        await outbox.shutdown()
+        return outbox.get_stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["retries"] == 0
+    assert len(smtp_server.attempted_at) == 1
+
+
+def test_unexpected_error_drops_one_mail_and_keeps_the_worker(smtp_server, monkeypatch):
+    real_deliver = MailOutbox._deliver
+
+    async def deliver(self, message, enqueued_at, attempt):
+        if message["To"] == "broken@example.com":
+            raise ValueError("cannot encode message")
+        await real_deliver(self, message, enqueued_at, attempt)
+
+    monkeypatch.setattr(MailOutbox, "_deliver", deliver)
+
+    async def scenario():
+        outbox = MailOutbox()
+        outbox.start()
+        outbox.enqueue(_message("broken@example.com"))
+        outbox.enqueue(_message("fine@example.com"))
+        await _until(lambda: outbox.get_stats()["sent"] == 1)
+        await outbox.shutdown()
+        return outbox.get_stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["failed"] == 1
+    assert [e.rcpt_tos for e in smtp_server.delivered] == [["fine@example.com"]]
+
+
+def test_worker_is_restarted_if_it_dies(smtp_server, monkeypatch):
+    real_next_batch = MailOutbox._next_batch
+    crashed = []
+
+    async def next_batch(self):
+        if not crashed:
+            crashed.append(True)
+            raise RuntimeError("worker bug")
+        return await real_next_batch(self)
+
+    monkeypatch.setattr(MailOutbox, "_next_batch", next_batch)
+    monkeypatch.setattr(outbox_module.logger, "disabled", True)
+
+    async def scenario():
+        outbox = MailOutbox()
+        outbox.start()
+        await _until(lambda: outbox.get_stats()["worker_restarts"] == 1)
+        outbox.enqueue(_message())
+        await _until(lambda: outbox.get_stats()["sent"] == 1)
+        await outbox.shutdown()
+
+    asyncio.run(scenario())
+    assert len(smtp_server.delivered) == 1
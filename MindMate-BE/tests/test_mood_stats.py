@@ -0,0 +1,66 @@
+import asyncio
+import uuid
+from datetime import date, datetime
+from sqlalchemy import delete, select
+from app.core.config import settings
+from app.db.models import MoodDailyRollup, MoodLog, User
+from app.services import mood_stats
+from app.services.mood_stats import local_day, reconcile_rollups, record_mood
+
+
+def test_local_day_uses_the_user_timezone():
+    # Asia/Kolkata is UTC+5:30
+    assert local_day(datetime(2026, 3, 1, 18, 29)) == date(2026, 3, 1)
+    assert local_day(datetime(2026, 3, 1, 18, 30)) == date(2026, 3, 2)
+
+
+def test_reconciler_folds_unrolled_logs_exactly_once(pg_sessions, monkeypatch):
+    monkeypatch.setattr(mood_stats, "SessionLocal", pg_sessions)
+    monkeypatch.setattr(settings, "MOOD_ROLLUP_RECONCILE_BATCH", 2)
+    user_id = uuid.uuid4()
+    # Written by an old release: (created_at UTC, mood), spanning local midnight
+    unrolled = [
+        (datetime(2026, 3, 1, 10, 0), 2),
+        (datetime(2026, 3, 1, 18, 29), 4),
+        (datetime(2026, 3, 1, 18, 30), 5),
+        (datetime(2026, 3, 2, 3, 0), 5),
+        (datetime(2026, 3, 2, 9, 0), 1),
+    ]
+
+    async def rollups(db):
+        rows = (await db.scalars(select(MoodDailyRollup).where(MoodDailyRollup.user_id == user_id))).all()
+        return {r.day: (r.count, r.total, [r.count_1, r.count_2, r.count_3, r.count_4, r.count_5]) for r in rows}
+
+    async def scenario():
+        async with pg_sessions() as db:
+            db.add(User(id=user_id, email=f"{user_id}@mindmate.test"))
+            await db.flush()
+            # One log written the current way, rollup and all
+            logged_at = datetime(2026, 3, 1, 8, 0)
+            db.add(MoodLog(user_id=user_id, mood=3, created_at=logged_at))
+            await record_mood(db, user_id, logged_at, 3)
+            db.add_all([MoodLog(user_id=user_id, mood=m, created_at=t, in_rollup=False) for t, m in unrolled])
+            await db.commit()
+        try:
+            # A log that never leaves the pending set would keep the reconciler looping
+            first = await asyncio.wait_for(reconcile_rollups(), 10)
+            second = await asyncio.wait_for(reconcile_rollups(), 10)
+            async with pg_sessions() as db:
+                left = (await db.scalars(
+                    select(MoodLog.id).where(MoodLog.user_id == user_id, MoodLog.in_rollup.is_(False))
+                )).all()
+                return first, second, left, await rollups(db)
+        finally:
+            async with pg_sessions() as db:
+                await db.execute(delete(MoodLog).where(MoodLog.user_id == user_id))
+                await db.execute(delete(User).where(User.id == user_id))
+                await db.commit()
+
+    first, second, left, days = asyncio.run(scenario())
+    assert first == len(unrolled)
+    assert second == 0
+    assert left == []
+    assert days == {
+        date(2026, 3, 1): (3, 3 + 2 + 4, [0, 1, 1, 1, 0]),
+        date(2026, 3, 2): (3, 5 + 5 + 1, [1, 0, 0, 0, 2]),
+    }
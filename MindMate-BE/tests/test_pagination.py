@@ -0,0 +1,113 @@
+import asyncio
+import uuid
+from datetime import date, datetime, timedelta
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import delete, select
+from app.db.models import MoodLog, User
+from app.services.pagination import (
+    AFTER_CURSOR_HEADER, BEFORE_CURSOR_HEADER, decode_cursor, encode_cursor, filter_created_between, keyset_page,
+    set_cursor_headers,
+)
+
+
+def test_cursor_round_trip():
+    created_at, row_id = datetime(2026, 3, 1, 12, 30, 15, 123456), uuid.uuid4()
+    assert decode_cursor(encode_cursor(created_at, row_id)) == (created_at, row_id)
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "bm8tcGlwZQ==", "MjAyNnx4eXo=", "é"])
+def test_bad_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as raised:
+        decode_cursor(cursor)
+    assert raised.value.status_code == 400
+
+
+def test_before_and_after_together_is_a_400():
+    cursor = encode_cursor(datetime(2026, 3, 1), uuid.uuid4())
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(keyset_page(None, select(MoodLog), MoodLog.created_at, MoodLog.id, 10, before=cursor, after=cursor))
+    assert raised.value.status_code == 400
+
+
+def test_date_filter_is_inclusive_local_days_in_utc():
+    stmt = filter_created_between(select(MoodLog), MoodLog.created_at, date(2026, 3, 1), date(2026, 3, 2))
+    # Asia/Kolkata midnight is 18:30 UTC the previous evening; `to` runs to the end of its day
+    assert sorted(stmt.compile().params.values()) == [datetime(2026, 2, 28, 18, 30), datetime(2026, 3, 2, 18, 30)]
+
+
+def test_date_filter_rejects_a_backwards_range():
+    with pytest.raises(HTTPException) as raised:
+        filter_created_between(select(MoodLog), MoodLog.created_at, date(2026, 3, 2), date(2026, 3, 1))
+    assert raised.value.status_code == 400
+
+
+def row(minute):
+    return type("Row", (), {"created_at": datetime(2026, 3, 1, 9, minute), "id": uuid.uuid4()})
+
+
+@pytest.mark.parametrize("has_more, before, after, expected", [
+    (False, None, None, set()),                     # everything fits on the newest page
+    (True, None, None, {BEFORE_CURSOR_HEADER}),     # newest page, older ones exist
+    (True, "b", None, {BEFORE_CURSOR_HEADER, AFTER_CURSOR_HEADER}),
+    (False, "b", None, {AFTER_CURSOR_HEADER}),      # reached the oldest row
+    (True, None, "a", {BEFORE_CURSOR_HEADER, AFTER_CURSOR_HEADER}),
+    (False, None, "a", {BEFORE_CURSOR_HEADER}),     # caught up with the newest row
+])
+def test_cursor_headers(has_more, before, after, expected):
+    oldest, newest = row(0), row(5)
+    response = Response()
+    set_cursor_headers(response, oldest, newest, has_more, before, after)
+
+    assert {h for h in (BEFORE_CURSOR_HEADER, AFTER_CURSOR_HEADER) if h in response.headers} == expected
+    if BEFORE_CURSOR_HEADER in expected:
+        assert decode_cursor(response.headers[BEFORE_CURSOR_HEADER]) == (oldest.created_at, oldest.id)
+    if AFTER_CURSOR_HEADER in expected:
+        assert decode_cursor(response.headers[AFTER_CURSOR_HEADER]) == (newest.created_at, newest.id)
+
+
+def test_keyset_walk_visits_every_row_once_across_tied_timestamps(pg_sessions):
+    user_id = uuid.uuid4()
+    start = datetime(2026, 3, 1, 9, 0)
+    # Three logs share each timestamp, so only the id tiebreak keeps pages apart
+    times = [start + timedelta(minutes=i // 3) for i in range(11)]
+
+    async def scenario():
+        async with pg_sessions() as db:
+            db.add(User(id=user_id, email=f"{user_id}@mindmate.test"))
+            await db.flush()
+            db.add_all([MoodLog(user_id=user_id, mood=3, created_at=t) for t in times])
+            await db.commit()
+        try:
+            async with pg_sessions() as db:
+                stmt = select(MoodLog).where(MoodLog.user_id == user_id)
+                expected = [log.id for log in sorted(
+                    (await db.scalars(stmt)).all(), key=lambda log: (log.created_at, log.id), reverse=True
+                )]
+
+                walked, before = [], None
+                while True:
+                    rows, has_more = await keyset_page(db, stmt, MoodLog.created_at, MoodLog.id, 4, before=before)
+                    walked += [r.id for r in rows]
+                    if not has_more:
+                        break
+                    before = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+                oldest = rows[-1]
+                back, after = [], encode_cursor(oldest.created_at, oldest.id)
+                while True:
+                    rows, has_more = await keyset_page(db, stmt, MoodLog.created_at, MoodLog.id, 4, after=after)
+                    back += [r.id for r in rows]
+                    if not has_more:
+                        break
+                    after = encode_cursor(rows[-1].created_at, rows[-1].id)
+                return expected, walked, back
+        finally:
+            async with pg_sessions() as db:
+                await db.execute(delete(MoodLog).where(MoodLog.user_id == user_id))
+                await db.execute(delete(User).where(User.id == user_id))
+                await db.commit()
+
+    expected, walked, back = asyncio.run(scenario())
+    assert walked == expected
+    assert back == list(reversed(expected))[1:]
@@ -0,0 +1,125 @@
+import asyncio
+import pytest
+from jose import jwt
+from app.core.config import settings
+from app.services import rate_limit
+from app.services.rate_limit import MemoryBuckets, RateLimitMiddleware, RateRule, _client_ip
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return clock
+
+
+def take(buckets, keys, rule):
+    return asyncio.run(buckets.take(keys, rule))
+
+
+def test_burst_then_wait_for_refill(clock):
+    rule = RateRule("t", capacity=3, per_minute=60)
+    buckets = MemoryBuckets()
+
+    assert [take(buckets, ["a"], rule) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert take(buckets, ["a"], rule) == pytest.approx(1.0)
+
+    clock.now += 1.0
+    assert take(buckets, ["a"], rule) == 0.0
+    # Other keys have their own bucket
+    assert take(buckets, ["b"], rule) == 0.0
+
+
+def test_rejected_request_does_not_drain_the_other_buckets(clock):
+    rule = RateRule("t", capacity=2, per_minute=60)
+    buckets = MemoryBuckets()
+    take(buckets, ["ip", "user"], rule)
+    take(buckets, ["user"], rule)
+
+    # The user bucket is empty: rejected, and the shared IP bucket keeps its token
+    assert take(buckets, ["ip", "user"], rule) > 0
+    assert take(buckets, ["ip", "user"], rule) > 0
+    assert take(buckets, ["ip"], rule) == 0.0
+
+
+def _scope(path="/auth/login", headers=(), client=("10.0.0.1", 5000)):
+    return {"type": "http", "method": "POST", "path": path, "headers": list(headers), "client": client}
+
+
+def test_client_ip_ignores_forwarded_header_unless_trusted(monkeypatch):
+    scope = _scope(headers=[(b"x-forwarded-for", b"203.0.113.9")])
+    monkeypatch.setattr(settings, "RATE_LIMIT_TRUST_FORWARDED", False)
+    assert _client_ip(scope) == "10.0.0.1"
+
+
+def test_client_ip_takes_the_hop_the_proxy_appended(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_TRUST_FORWARDED", True)
+    # A client can put anything in front; only the last entry comes from the ingress
+    spoofed = _scope(headers=[(b"x-forwarded-for", b"1.2.3.4, 203.0.113.9")])
+    assert _client_ip(spoofed) == "203.0.113.9"
+    assert _client_ip(_scope()) == "10.0.0.1"
+
+
+def _call(middleware, scope):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    start = next(m for m in sent if m["type"] == "http.response.start")
+    return start["status"], dict(start["headers"])
+
+
+@pytest.fixture
+def middleware(monkeypatch, clock):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_TRUST_FORWARDED", True)
+    monkeypatch.setattr(rate_limit, "_buckets", MemoryBuckets())
+    monkeypatch.setitem(rate_limit.ROUTE_RULES, ("POST", "/chat/send"), RateRule("chat", 2, 60))
+    return RateLimitMiddleware(app)
+
+
+def test_limits_per_forwarded_client_with_retry_after(middleware):
+    alice = _scope("/chat/send", headers=[(b"x-forwarded-for", b"198.51.100.1")])
+    bob = _scope("/chat/send", headers=[(b"x-forwarded-for", b"198.51.100.2")])
+
+    assert [_call(middleware, alice)[0] for _ in range(2)] == [200, 200]
+    status, headers = _call(middleware, alice)
+    assert status == 429
+    assert headers[b"retry-after"] == b"1"
+    # Same ingress, different client: not affected
+    assert _call(middleware, bob)[0] == 200
+
+
+def test_user_over_limit_does_not_use_up_their_ip(middleware):
+    token = jwt.encode({"sub": "alice@example.com"}, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    bearer = (b"authorization", f"Bearer {token}".encode())
+    home = (b"x-forwarded-for", b"198.51.100.1")
+    office = (b"x-forwarded-for", b"198.51.100.2")
+
+    assert [_call(middleware, _scope("/chat/send", headers=[home, bearer]))[0] for _ in range(2)] == [200, 200]
+    # Her user bucket is empty now, so these are rejected wherever they come from...
+    assert [_call(middleware, _scope("/chat/send", headers=[office, bearer]))[0] for _ in range(3)] == [429] * 3
+    # ...without spending the office IP's tokens, which colleagues still have
+    colleague = _scope("/chat/send", headers=[office])
+    assert [_call(middleware, colleague)[0] for _ in range(2)] == [200, 200]
+
+
+def test_unlimited_routes_pass_through(middleware):
+    assert all(_call(middleware, _scope("/mood/"))[0] == 200 for _ in range(10))
@@ -0,0 +1,70 @@
+import pytest
+from app.core.config import settings
+from app.services import topic_classifier
+from app.services.topic_classifier import classify_message
+
+
+@pytest.fixture
+def enforce(monkeypatch):
+    monkeypatch.setattr(settings, "TOPIC_CLASSIFIER_MODE", "enforce")
+    monkeypatch.setattr(settings, "TOPIC_OFF_TOPIC_THRESHOLD", 3.0)
+
+
+# Usual answers to the bot's own "rate your mood" / "how many hours" questions
+@pytest.mark.parametrize("text", [
+    "7/10", "4/5", "3-4", "6/10?", "50-50", "24/7", "12/03", "2", "10/10 today!", "maybe 5-6 hours",
+    "1/5, rough day", "0", "about 3/10?",
+])
+def test_numeric_replies_reach_the_model(enforce, text):
+    assert classify_message(text) == "llm"
+
+
+@pytest.mark.parametrize("text", [
+    "my boss made me debug the server all night and I'm exhausted",
+    "I'm so stressed about my python exam",
+    "ugh my code won't compile and I hate everything",
+    "I keep failing my calculus homework and feel stupid",
+    "can you help me cope with exam pressure",
+    "my dad keeps yelling about the electricity bill of 2000",
+])
+def test_talking_about_yourself_reaches_the_model(enforce, text):
+    assert classify_message(text) == "llm"
+
+
+@pytest.mark.parametrize("text", [
+    "what is 12 * 7?",
+    "what's 2+2",
+    "calculate 3/4",
+    "how much is 17.5 * 3",
+    "17*23 = ?",
+    "solve for x: 2x + 3 = 7",
+    "write a python function that reverses a string",
+    "can you write a regex for emails",
+    "please calculate the integral of x^2",
+    "```\nimport os\nprint(os.listdir())\n```",
+    "how do I configure kubernetes ingress",
+])
+def test_explicit_task_requests_are_refused(enforce, text):
+    assert classify_message(text) == "refuse"
+
+
+@pytest.mark.parametrize("text", ["python", "sql", "the algorithm of my life", "what is docker"])
+def test_technical_words_without_a_request_reach_the_model(enforce, text):
+    assert classify_message(text) == "llm"
+
+
+def test_shadow_mode_only_counts_would_be_refusals(monkeypatch):
+    monkeypatch.setattr(settings, "TOPIC_CLASSIFIER_MODE", "shadow")
+    before = dict(topic_classifier._stats)
+
+    assert classify_message("what is 12 * 7?") == "llm"
+
+    assert topic_classifier._stats["would_refuse"] == before["would_refuse"] + 1
+    assert topic_classifier._stats["refused"] == before["refused"]
+
+
+def test_off_mode_skips_classification(monkeypatch):
+    monkeypatch.setattr(settings, "TOPIC_CLASSIFIER_MODE", "off")
+    before = topic_classifier._stats["classified"]
+    assert classify_message("write a python function") == "llm"
+    assert topic_classifier._stats["classified"] == before